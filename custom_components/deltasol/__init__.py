@@ -6,10 +6,12 @@ https://github.com/dm82m/hass-Deltasol-KM2"""
 
 import asyncio
 import logging
+import time
 from dataclasses import dataclass
-from datetime import timedelta
+from datetime import datetime, timedelta
 
 import voluptuous as vol
+from aiohttp import ClientError
 from homeassistant.components.sensor import PLATFORM_SCHEMA_BASE
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.const import (
@@ -22,18 +24,53 @@ from homeassistant.const import (
     CONF_USERNAME,
     Platform,
 )
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, callback
 from homeassistant.exceptions import ConfigEntryNotReady, IntegrationError
 from homeassistant.helpers import config_validation as cv
+from homeassistant.helpers import entity_registry as er
+from homeassistant.helpers.aiohttp_client import async_get_clientsession
+from homeassistant.helpers.event import async_track_time_interval
+from homeassistant.helpers.storage import Store
 from homeassistant.helpers.update_coordinator import DataUpdateCoordinator
+from homeassistant.util import dt as dt_util
 
+from .aggregate import DeltasolAggregator
+from .backfill import DeltasolBackfill
 from .const import (
+    CONF_ADAPTIVE_POLLING,
+    CONF_BACKFILL,
+    CONF_DEADBANDS,
+    CONF_EXCLUDE,
+    CONF_INCLUDE,
+    CONF_SAMPLE_INTERVAL,
+    CONF_TRANSPORT,
+    CONF_VSF_PATH,
+    DEADBAND_MAX_AGE,
     DEFAULT_NAME,
     DEFAULT_SCAN_INTERVAL,
     DEFAULT_TIMEOUT,
+    DEFAULT_VBUS_PASSWORD,
+    DEFAULT_VSF_PATH,
+    DOMAIN,
+    MIN_SAMPLE_INTERVAL,
     MIN_SCAN_INTERVAL,
+    STORAGE_SAVE_DELAY,
+    STORAGE_VERSION,
+    TRANSPORT_HTTP,
+    TRANSPORT_VBUS_SERIAL,
+    VBUS_RECONNECT_INTERVAL,
 )
-from .deltasolapi import DeltasolApi, DeltasolEndpoint
+from .deadband import DeadbandFilter, parse_deadbands
+from .deltasolapi import (
+    DeltasolApi,
+    DeltasolData,
+    DeltasolProjection,
+    DeltasolSelection,
+)
+from .poller import DeltasolPoller, async_get_poller
+from .scheduler import AdaptiveScheduler, DeviceClockAligner
+from .vbus import VBusLanClient, VBusSerialClient, VBusStream
+from .vsf import VBusSpecification
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -79,26 +116,74 @@ async def async_setup_entry(
     # This is defined in below
     coordinator = DeltasolCoordinator(hass, config_entry)
 
-    # Perform an initial data load from api.
-    # async_config_entry_first_refresh() is special in that it does not log errors if it fails
-    await coordinator.async_config_entry_first_refresh()
+    if coordinator.backfill is not None:
+        # Determine the gap since the last run before polling again
+        await coordinator.backfill.async_load()
+
+    if await coordinator.async_restore_snapshot():
+        # Entities are created from the stored snapshot right away, live data
+        # catches up in the background.
+        config_entry.async_create_background_task(
+            hass, coordinator.async_refresh(), "deltasol initial refresh"
+        )
+    else:
+        # Perform an initial data load from api.
+        # async_config_entry_first_refresh() is special in that it does not log errors if it fails
+        await coordinator.async_config_entry_first_refresh()
 
-    # Test to see if api initialised correctly, else raise ConfigNotReady to make HA retry setup
-    if not coordinator.api.product_details:
-        raise ConfigEntryNotReady
+        # Test to see if api initialised correctly, else raise ConfigNotReady to make HA retry setup
+        if not coordinator.api.product_details:
+            raise ConfigEntryNotReady
 
     # Add the coordinator and update listener to config runtime data to make
     # accessible throughout your integration
     config_entry.runtime_data = RuntimeData(coordinator)
+    if coordinator.poller is not None:
+        coordinator.poller.async_add(coordinator)
 
     # Setup platforms (based on the list of entity types in PLATFORMS defined above)
     # This calls the async_setup method in each of your entity type files.
     await hass.config_entries.async_forward_entry_setups(config_entry, PLATFORMS)
 
+    if coordinator.aggregator is not None:
+        coordinator.async_start_sampling()
+
+    if coordinator.backfill is not None:
+        # Entities are registered now, import the hours missed from the log
+        config_entry.async_create_background_task(
+            hass, coordinator.backfill.async_run(), "deltasol backfill"
+        )
+
     # Return true to denote a successful setup.
     return True
 
 
+async def async_migrate_entry(
+    hass: HomeAssistant, config_entry: DeltasolConfigEntry
+) -> bool:
+    """Migrate a config entry of an older version."""
+    if config_entry.version > 1:
+        # Downgraded from a future version
+        return False
+
+    if config_entry.minor_version < 2:
+        # Several entries may poll one device, their sensors of the same
+        # field need their own unique ids
+        prefix = config_entry.entry_id + "__"
+
+        @callback
+        def namespace(entity_entry: er.RegistryEntry) -> dict | None:
+            if entity_entry.unique_id.startswith(prefix):
+                return None
+            return {"new_unique_id": prefix + entity_entry.unique_id}
+
+        await er.async_migrate_entries(hass, config_entry.entry_id, namespace)
+        hass.config_entries.async_update_entry(config_entry, minor_version=2)
+        _LOGGER.debug("Migrated config entry to version 1.2")
+
+    return True
+
+
 async def async_unload_entry(
     hass: HomeAssistant, config_entry: DeltasolConfigEntry
 ) -> bool:
@@ -107,23 +192,103 @@ async def async_unload_entry(
     # If you have created any custom services, they need to be removed here too.
 
     # Unload platforms and return result
-    return await hass.config_entries.async_unload_platforms(config_entry, PLATFORMS)
+    unloaded = await hass.config_entries.async_unload_platforms(config_entry, PLATFORMS)
+    coordinator = config_entry.runtime_data.coordinator
+    if unloaded and coordinator.poller is not None:
+        coordinator.poller.async_remove(coordinator)
+    return unloaded
+
+
+async def async_remove_entry(
+    hass: HomeAssistant, config_entry: DeltasolConfigEntry
+) -> None:
+    """Remove the stored snapshot and backfill progress of a removed config entry."""
+    for key in (
+        f"{DOMAIN}.{config_entry.entry_id}",
+        f"{DOMAIN}.{config_entry.entry_id}.backfill",
+    ):
+        await Store(hass, STORAGE_VERSION, key).async_remove()
 
 
 class DeltasolCoordinator(DataUpdateCoordinator):
     """Coordinator class."""
 
-    data: dict[str, DeltasolEndpoint]
+    data: DeltasolData
 
     def __init__(self, hass: HomeAssistant, config: DeltasolConfigEntry) -> None:
         """Initialize coordinator."""
         self.hass = hass
-        self.api = DeltasolApi(
-            host=config.data.get(CONF_HOST),
-            port=config.data.get(CONF_PORT),
-            username=config.data.get(CONF_USERNAME),
-            password=config.data.get(CONF_PASSWORD),
-            api_key=config.data.get(CONF_API_KEY),
+        self._config = config
+        self._store: Store[dict] = Store(
+            hass, STORAGE_VERSION, f"{DOMAIN}.{config.entry_id}"
+        )
+        # Transports other than http decode VBus themselves and push updates
+        self._transport = config.data.get(CONF_TRANSPORT, TRANSPORT_HTTP)
+        self.stream: VBusStream | None = None
+        # Resolved with the first header set decoded after it was requested
+        self._stream_data: asyncio.Future[DeltasolData] | None = None
+        # Last header set decoded from the stream
+        self._stream_latest: DeltasolData | None = None
+        # DL2/DL3 filters and fields of the device this entry publishes
+        self.filters = DeltasolApi.parse_filters(config.data.get(CONF_API_KEY))
+        self.selection = DeltasolSelection(
+            config.data.get(CONF_INCLUDE), config.data.get(CONF_EXCLUDE)
+        )
+        # Config entries polling the same device share one poller and api,
+        # which fetches every field, the fields of this entry are projected
+        self.poller: DeltasolPoller | None = None
+        self._projection = DeltasolProjection(self.selection)
+        if self._transport == TRANSPORT_HTTP:
+            self.poller = async_get_poller(hass, config.data)
+            self.api = self.poller.api
+        else:
+            self.api = DeltasolApi(
+                session=async_get_clientsession(hass),
+                host=config.data.get(CONF_HOST),
+                port=config.data.get(CONF_PORT),
+                username=config.data.get(CONF_USERNAME),
+                password=config.data.get(CONF_PASSWORD),
+                api_key=config.data.get(CONF_API_KEY),
+                selection=self.selection,
+            )
+            self.api.product = self._transport
+            self.api.product_details = {
+                "vendor": "RESOL",
+                "serial": config.data.get(CONF_HOST),
+                "version": "",
+                "build": "",
+                "name": "VBus",
+                "features": self._transport,
+            }
+        scan_interval = max(
+            config.data.get(CONF_SCAN_INTERVAL, DEFAULT_SCAN_INTERVAL),
+            MIN_SCAN_INTERVAL,
+        )
+        self._scheduler = (
+            AdaptiveScheduler(MIN_SCAN_INTERVAL, scan_interval)
+            if config.data.get(CONF_ADAPTIVE_POLLING, False)
+            else None
+        )
+        self._scan_interval = scan_interval
+        # Polls sample faster than they are published, if configured
+        sample_interval = config.data.get(CONF_SAMPLE_INTERVAL, 0)
+        self.aggregator = (
+            DeltasolAggregator()
+            if self._transport == TRANSPORT_HTTP
+            and MIN_SAMPLE_INTERVAL <= sample_interval < scan_interval
+            else None
+        )
+        # Seconds between samples, 0 if the entry does not sample
+        self.sample_interval = sample_interval if self.aggregator is not None else 0
+        self._sampling = False
+        self._aligner = DeviceClockAligner()
+        # Only offered for DL2/DL3, the only devices with a downloadable log
+        self.backfill = (
+            DeltasolBackfill(
+                hass, config.entry_id, self.api, self.filters, self.selection
+            )
+            if config.data.get(CONF_BACKFILL, False)
+            else None
         )
         super().__init__(
             hass,
@@ -131,23 +296,246 @@ class DeltasolCoordinator(DataUpdateCoordinator):
             name="deltasol_sensor",
             update_method=self.async_update_data,
             # Polling interval. Will only be polled if there are subscribers.
-            update_interval=timedelta(
-                seconds=max(
-                    config.data.get(CONF_SCAN_INTERVAL, DEFAULT_SCAN_INTERVAL),
-                    MIN_SCAN_INTERVAL,
-                )
+            update_interval=(
+                timedelta(seconds=scan_interval)
+                if self._transport == TRANSPORT_HTTP
+                else None
             ),
         )
+        try:
+            deadbands = parse_deadbands(config.data.get(CONF_DEADBANDS))
+        except ValueError as error:
+            _LOGGER.warning("Ignoring invalid deadbands: %s", error)
+            deadbands = ()
+        self._deadband = (
+            DeadbandFilter(deadbands, DEADBAND_MAX_AGE) if deadbands else None
+        )
+        # unique_ids whose value changed in the last refresh, None means all
+        self.changed: set[str] | None = None
+        self._notified_success = True
+        self.entity_updates = 0
+        self.skipped_updates = 0
+        self.last_successful_poll: datetime | None = None
+
+    async def async_restore_snapshot(self) -> bool:
+        """Restore product and data stored by a previous run, if any."""
+        snapshot = await self._store.async_load()
+        if (
+            not snapshot
+            or snapshot.get("host") != self._config.data.get(CONF_HOST)
+            or snapshot.get("port") != self._config.data.get(CONF_PORT)
+            # Values are stored for the selected fields only
+            or snapshot.get("selection", [[], []]) != self.__selection()
+        ):
+            return False
+
+        try:
+            data = DeltasolData.from_dict(snapshot["data"], self.selection)
+        except (KeyError, TypeError, ValueError) as error:
+            _LOGGER.warning("Ignoring invalid Resol snapshot: %s", error)
+            return False
+
+        if self.api.product is None:
+            # Not yet restored or polled for another config entry of the device
+            self.api.restore(snapshot["product"], data.product_details)
+        self.data = data
+        _LOGGER.debug("Restored %s Resol field(s) from snapshot", len(data))
+        return True
+
+    def __selection(self) -> list[list[str]]:
+        return [list(self.selection.include), list(self.selection.exclude)]
+
+    @callback
+    def __snapshot(self) -> dict:
+        return {
+            "host": self._config.data.get(CONF_HOST),
+            "port": self._config.data.get(CONF_PORT),
+            "selection": self.__selection(),
+            "product": self.api.product,
+            "data": self.data.as_dict(),
+        }
+
+    @callback
+    def async_update_listeners(self) -> None:
+        """Update only the listeners whose value changed in the last refresh."""
+        changed, self.changed = self.changed, None
+        if changed is None or self._notified_success != self.last_update_success:
+            # Layout or availability changed, every entity needs a new state
+            self._notified_success = self.last_update_success
+            if self._deadband is not None and self.data is not None:
+                self._deadband.reset(self.data, time.monotonic())
+            super().async_update_listeners()
+            return
+
+        for update_callback, context in list(self._listeners.values()):
+            if context is None or context in changed:
+                self.entity_updates += 1
+                update_callback()
+            else:
+                self.skipped_updates += 1
+        _LOGGER.debug(
+            "%s value(s) changed, %s entity update(s) skipped so far",
+            len(changed),
+            self.skipped_updates,
+        )
 
     async def async_update_data(self):
         """Fetch data from the Resol KM1/KM2, DL2/DL2Plus/DL3, VBus/LAN, VBus/USB."""
-        async with asyncio.timeout(DEFAULT_TIMEOUT):
-            try:
-                data = await self.hass.async_add_executor_job(self.api.fetch_data)
-            except IntegrationError as error:
-                _LOGGER.error(
-                    "Stopping Resol integration due to previous error: %s", error
+        if self._transport != TRANSPORT_HTTP:
+            return await self.__async_wait_stream()
+
+        try:
+            async with asyncio.timeout(DEFAULT_TIMEOUT):
+                data = self.__project(await self.poller.async_fetch(self))
+        except IntegrationError as error:
+            _LOGGER.error("Stopping Resol integration due to previous error: %s", error)
+            self.__schedule_failure()
+            raise
+        except Exception:
+            self.__schedule_failure()
+            raise
+
+        if self.aggregator is not None:
+            # Publish the aggregate of the samples, always at the scan interval
+            self.aggregator.add(data)
+            data = self.aggregator.publish()
+            self.__accept(data)
+            if self._scheduler and self._scheduler.failures:
+                # Ends the backoff, aggregates are published at the scan interval
+                self.update_interval = self._scheduler.reset()
+            return data
+
+        self.__accept(data)
+        interval = (
+            self._scheduler.on_success(self.data, data).total_seconds()
+            if self._scheduler
+            else self._scan_interval
+        )
+        self._aligner.observe(self.api.device_timestamp, self.poller.sent)
+        self.update_interval = timedelta(
+            seconds=self._aligner.delay(interval, MIN_SCAN_INTERVAL, time.time())
+        )
+        return data
+
+    def __accept(self, data: DeltasolData) -> None:
+        if self._deadband is not None:
+            self.changed = self._deadband.changed(self.data, data, time.monotonic())
+        else:
+            self.changed = data.changed_ids(self.data)
+        self.last_successful_poll = dt_util.utcnow()
+        if self.backfill is not None:
+            self.backfill.mark_live(self.last_successful_poll)
+        if self.changed != set():
+            self._store.async_delay_save(self.__snapshot, STORAGE_SAVE_DELAY)
+
+    def __project(self, parts: dict[str | None, DeltasolData]) -> DeltasolData:
+        """Return the fields of this entry of the data polled per filter."""
+        return self._projection.project(
+            [parts[api_filter] for api_filter in self.filters or [None]]
+        )
+
+    @callback
+    def async_set_polled_data(self, parts: dict[str | None, DeltasolData]) -> None:
+        """Update with data polled for another config entry of the device."""
+        self.async_set_shared_data(self.__project(parts))
+
+    @callback
+    def async_set_shared_data(self, data: DeltasolData) -> None:
+        """Update with data pushed by a stream or polled for another entry."""
+        if self.aggregator is not None:
+            # Published with the next refresh
+            self.aggregator.add(data)
+            return
+        self.__accept(data)
+        self.async_set_updated_data(data)
+
+    @callback
+    def async_start_sampling(self) -> None:
+        """Sample the device between refreshes until the entry is unloaded."""
+        self._config.async_on_unload(
+            async_track_time_interval(
+                self.hass,
+                self.__async_sample,
+                timedelta(seconds=self.sample_interval),
+                name="deltasol sample",
+            )
+        )
+
+    async def __async_sample(self, now=None) -> None:
+        if self._sampling:
+            # The previous sample is still being fetched
+            return
+        self._sampling = True
+        try:
+            async with asyncio.timeout(DEFAULT_TIMEOUT):
+                parts = await self.poller.async_fetch(self, sample=True)
+                self.aggregator.add(self.__project(parts))
+        except (ClientError, IntegrationError, TimeoutError) as error:
+            # Errors are reported by the next refresh
+            _LOGGER.debug("Sample failed: %s", error)
+        finally:
+            self._sampling = False
+
+    def __schedule_failure(self) -> None:
+        if self._scheduler:
+            self.update_interval = self._scheduler.on_failure()
+
+    async def __async_wait_stream(self) -> DeltasolData:
+        if self.stream is None:
+            specification = await self.hass.async_add_executor_job(
+                VBusSpecification.load,
+                self.hass.config.path(
+                    self._config.data.get(CONF_VSF_PATH, DEFAULT_VSF_PATH)
+                ),
+            )
+            if self._transport == TRANSPORT_VBUS_SERIAL:
+                # Host holds the path of the serial device
+                self.stream = VBusSerialClient(
+                    device=self._config.data.get(CONF_HOST),
+                    specification=specification,
+                    on_update=self.__push,
                 )
-                raise
             else:
-                return data
+                self.stream = VBusLanClient(
+                    host=self._config.data.get(CONF_HOST),
+                    port=self._config.data.get(CONF_PORT),
+                    password=self._config.data.get(
+                        CONF_PASSWORD, DEFAULT_VBUS_PASSWORD
+                    ),
+                    specification=specification,
+                    on_update=self.__push,
+                )
+            self._config.async_create_background_task(
+                self.hass, self.__async_stream(), "deltasol vbus stream"
+            )
+
+        if self._stream_latest is not None:
+            # The stream pushes every header set, a refresh returns the latest
+            data = self._stream_latest
+        else:
+            # Wait for the first header set of the stream
+            if self._stream_data is None or self._stream_data.done():
+                self._stream_data = self.hass.loop.create_future()
+            async with asyncio.timeout(DEFAULT_TIMEOUT):
+                data = await asyncio.shield(self._stream_data)
+        self.__accept(data)
+        return data
+
+    async def __async_stream(self) -> None:
+        while True:
+            try:
+                await self.stream.async_run()
+            except (OSError, TimeoutError, IntegrationError) as error:
+                _LOGGER.warning("Lost VBus stream, reconnecting: %s", error)
+                self.async_set_update_error(error)
+            await asyncio.sleep(VBUS_RECONNECT_INTERVAL)
+
+    @callback
+    def __push(self, fingerprint, values) -> None:
+        data = self.api.build_data(fingerprint, values)
+        self._stream_latest = data
+        if self._stream_data is not None and not self._stream_data.done():
+            # Accepted by the waiting refresh
+            self._stream_data.set_result(data)
+            return
+        self.async_set_shared_data(data)
@@ -0,0 +1,109 @@
+"""
+Downsampling of fast samples to the published scan interval.
+Author: dm82m
+https://github.com/dm82m/hass-Deltasol-KM2
+
+The device is sampled more often than the coordinator publishes. Between two
+publishes every measurement keeps a running count, sum, min and max, so
+memory and work per sample do not depend on the number of samples. Published
+is the mean of every measurement (temperatures, power, flow rates, pressure
+and percentages), counters, states and other fields keep their last value.
+"""
+
+from .const import AGGREGATE_MEAN_UNITS
+from .deltasolapi import DeltasolData, DeltasolLayout
+
+
+class DeltasolAggregator:
+    """Running per field mean, min and max of the samples between publishes."""
+
+    def __init__(self) -> None:
+        """Initialise aggregator."""
+        self._layout: DeltasolLayout | None = None
+        # Whether the value of each slot is averaged or kept as last value
+        self._averaged: tuple[bool, ...] = ()
+        self._last: DeltasolData | None = None
+        self._pending = False
+        self._count: list[int] = []
+        self._sum: list[float] = []
+        self._min: list = []
+        self._max: list = []
+        # Window of the last published data
+        self.published: DeltasolData | None = None
+        self.minimum: list = []
+        self.maximum: list = []
+        self.samples: list[int] = []
+        self.sample_count = 0
+
+    def __reset(self) -> None:
+        size = len(self._averaged)
+        self._count = [0] * size
+        self._sum = [0.0] * size
+        self._min = [None] * size
+        self._max = [None] * size
+
+    def add(self, data: DeltasolData) -> bool:
+        """Add a sample, return False if it was added already."""
+        if data is self._last:
+            # The device has not refreshed its data since the last sample
+            return False
+        if data.layout is not self._layout:
+            # Samples of a different layout can not be combined
+            self._layout = data.layout
+            self._averaged = tuple(
+                field.unit in AGGREGATE_MEAN_UNITS for field in data.layout.fields
+            )
+            self.__reset()
+        self._last = data
+        self._pending = True
+        self.sample_count += 1
+
+        count, total, minimum, maximum = self._count, self._sum, self._min, self._max
+        for slot, (averaged, value) in enumerate(zip(self._averaged, data.values)):
+            if (
+                not averaged
+                or not isinstance(value, (int, float))
+                or isinstance(value, bool)
+            ):
+                continue
+            if count[slot]:
+                count[slot] += 1
+                total[slot] += value
+                if value < minimum[slot]:
+                    minimum[slot] = value
+                elif value > maximum[slot]:
+                    maximum[slot] = value
+            else:
+                count[slot] = 1
+                total[slot] = value
+                minimum[slot] = maximum[slot] = value
+        return True
+
+    def publish(self) -> DeltasolData | None:
+        """Return the aggregate of the samples since the last publish.
+
+        Returns the previously published data if no sample was added since.
+        """
+        if not self._pending:
+            return self.published
+        values = list(self._last.values)
+        for slot, count in enumerate(self._count):
+            if count:
+                values[slot] = round(self._sum[slot] / count, 2)
+        self.published = DeltasolData(self._layout, values, self._last.product_details)
+        self.minimum, self.maximum, self.samples = self._min, self._max, self._count
+        self.__reset()
+        self._pending = False
+        return self.published
+
+    def statistics(self, slot: int) -> dict | None:
+        """Return min, max and sample count of a published averaged field."""
+        if self.published is None or slot >= len(self.samples):
+            return None
+        if not self.samples[slot]:
+            return None
+        return {
+            "min": self.minimum[slot],
+            "max": self.maximum[slot],
+            "samples": self.samples[slot],
+        }
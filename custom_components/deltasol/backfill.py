@@ -0,0 +1,228 @@
+"""
+Backfills the DL2/DL3 log into Home Assistant long-term statistics.
+Author: dm82m
+https://github.com/dm82m/hass-Deltasol-KM2
+
+While Home Assistant is not running, the DL2/DL3 keeps logging. On startup
+the log of that gap is downloaded in chunks, aggregated to hourly mean, min
+and max and imported through the recorder. Progress is stored after every
+chunk, so an interrupted backfill continues where it stopped.
+"""
+
+import datetime
+import logging
+
+from aiohttp import ClientError
+from homeassistant.components.recorder.models import (
+    StatisticData,
+    StatisticMeanType,
+    StatisticMetaData,
+)
+from homeassistant.components.recorder.statistics import async_import_statistics
+from homeassistant.const import Platform
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.exceptions import IntegrationError
+from homeassistant.helpers import entity_registry as er
+from homeassistant.helpers.storage import Store
+from homeassistant.util import dt as dt_util
+
+from .const import (
+    BACKFILL_CHUNK_HOURS,
+    BACKFILL_MAX_DAYS,
+    BACKFILL_UNITS,
+    DOMAIN,
+    STORAGE_SAVE_DELAY,
+    STORAGE_VERSION,
+)
+from .deltasolapi import DeltasolApi, DeltasolLayout, DeltasolSelection
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def floor_hour(moment: datetime.datetime) -> datetime.datetime:
+    """Return the start of the hour of moment."""
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+class DeltasolBackfill:
+    """Imports the hours Home Assistant missed from the DL2/DL3 log."""
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        entry_id: str,
+        api: DeltasolApi,
+        filters: list[str],
+        selection: DeltasolSelection,
+    ) -> None:
+        """Initialise backfill of the filters and fields of a config entry."""
+        self.hass = hass
+        self.entry_id = entry_id
+        self.api = api
+        self.filters = filters
+        self.selection = selection
+        self._store = Store(hass, STORAGE_VERSION, f"{DOMAIN}.{entry_id}.backfill")
+        # Hour up to which live polls have covered the statistics
+        self.live_until: datetime.datetime | None = None
+        # Range still to be imported from the log
+        self.start: datetime.datetime | None = None
+        self.end: datetime.datetime | None = None
+        self.imported_hours = 0
+
+    async def async_load(self) -> None:
+        """Load progress and determine the gap since the last live poll.
+
+        Must be called before the first poll of this run.
+        """
+        stored = await self._store.async_load() or {}
+        live_until = dt_util.parse_datetime(stored.get("live_until") or "")
+        backfill_from = dt_util.parse_datetime(stored.get("backfill_from") or "")
+
+        # The hour of the first live poll of this run is compiled from live data
+        self.end = floor_hour(dt_util.utcnow())
+        # The hour of the last live poll was compiled from live data as well,
+        # only the full hours between both are imported
+        after_live = live_until + datetime.timedelta(hours=1) if live_until else None
+        starts = [start for start in (after_live, backfill_from) if start is not None]
+        if not starts:
+            # First run, there is nothing missed yet
+            return
+        self.start = max(
+            min(starts), self.end - datetime.timedelta(days=BACKFILL_MAX_DAYS)
+        )
+        self.live_until = live_until
+        await self._store.async_save(self.__data())
+
+    def __data(self) -> dict:
+        return {
+            "live_until": self.live_until.isoformat() if self.live_until else None,
+            "backfill_from": (
+                self.start.isoformat()
+                if self.start is not None and self.start < self.end
+                else None
+            ),
+        }
+
+    @callback
+    def mark_live(self, now: datetime.datetime) -> None:
+        """Record a successful live poll."""
+        hour = floor_hour(now)
+        if self.live_until != hour:
+            self.live_until = hour
+            self._store.async_delay_save(self.__data, STORAGE_SAVE_DELAY)
+
+    async def async_run(self) -> None:
+        """Import the missed range chunk by chunk."""
+        if self.start is None or self.start >= self.end:
+            return
+        _LOGGER.info(f"Backfilling DL2/DL3 log from {self.start} to {self.end}")
+
+        while self.start < self.end:
+            end = min(
+                self.start + datetime.timedelta(hours=BACKFILL_CHUNK_HOURS), self.end
+            )
+            try:
+                self.imported_hours += await self.__async_import(self.start, end)
+            except (ClientError, IntegrationError, TimeoutError) as e:
+                _LOGGER.warning(
+                    f"Backfill stopped at {self.start}, continuing next start - {e}"
+                )
+                return
+            self.start = end
+            await self._store.async_save(self.__data())
+
+        _LOGGER.info(f"Backfill done, {self.imported_hours} hourly statistics imported")
+
+    async def __async_import(
+        self, start: datetime.datetime, end: datetime.datetime
+    ) -> int:
+        """Import the log between start and end, return the hours imported."""
+        registry = er.async_get(self.hass)
+        entity_ids = {}
+        units = {}
+        # entity_id -> hour -> [count, sum, min, max]
+        buckets: dict[str, dict[datetime.datetime, list]] = {}
+
+        # The log holds the fields of one filter per download
+        for api_filter in self.filters or [None]:
+            headers = []
+            # (header index, field index) -> field of the sensors to import
+            targets = None
+            async for path, value in self.api.stream_log(start, end, api_filter):
+                if path == "headers.item":
+                    headers.append(value)
+                    continue
+                if path != "headersets.item":
+                    continue
+
+                if targets is None:
+                    layout = DeltasolLayout(
+                        DeltasolLayout.fingerprint_of(headers), self.selection
+                    )
+                    targets = {}
+                    for field in layout.fields:
+                        if field.unit not in BACKFILL_UNITS:
+                            continue
+                        entity_id = registry.async_get_entity_id(
+                            Platform.SENSOR,
+                            DOMAIN,
+                            self.entry_id + "__" + field.unique_id,
+                        )
+                        if entity_id is not None:
+                            targets[(field.header_index, field.field_index)] = field
+                            entity_ids[field.unique_id] = entity_id
+                            units[entity_id] = field.unit
+
+                timestamp = value.get("timestamp")
+                if not isinstance(timestamp, (int, float)):
+                    continue
+                if timestamp > 1e11:
+                    # Milliseconds since the epoch
+                    timestamp /= 1000
+                hour = floor_hour(dt_util.utc_from_timestamp(timestamp))
+                if not start <= hour < end:
+                    continue
+
+                for header_index, packet in enumerate(value.get("packets", [])):
+                    header_index = packet.get("header_index", header_index)
+                    for field_index, field_value in enumerate(packet["field_values"]):
+                        field = targets.get(
+                            (header_index, field_value.get("field_index", field_index))
+                        )
+                        raw = field_value.get("raw_value")
+                        if field is None or not isinstance(raw, (int, float)):
+                            continue
+                        bucket = buckets.setdefault(entity_ids[field.unique_id], {})
+                        stats = bucket.get(hour)
+                        if stats is None:
+                            bucket[hour] = [1, raw, raw, raw]
+                        else:
+                            stats[0] += 1
+                            stats[1] += raw
+                            stats[2] = min(stats[2], raw)
+                            stats[3] = max(stats[3], raw)
+
+        hours = 0
+        for entity_id, bucket in buckets.items():
+            metadata = StatisticMetaData(
+                has_sum=False,
+                mean_type=StatisticMeanType.ARITHMETIC,
+                name=None,
+                source="recorder",
+                statistic_id=entity_id,
+                unit_class=None,
+                unit_of_measurement=units[entity_id],
+            )
+            statistics = [
+                StatisticData(
+                    start=hour,
+                    mean=round(total / count, 2),
+                    min=round(minimum, 2),
+                    max=round(maximum, 2),
+                )
+                for hour, (count, total, minimum, maximum) in sorted(bucket.items())
+            ]
+            async_import_statistics(self.hass, metadata, statistics)
+            hours += len(statistics)
+        _LOGGER.debug(f"Imported {hours} hourly statistics from {start} to {end}")
+        return hours
@@ -0,0 +1,62 @@
+"""
+Ring buffer of the last raw live responses of a device.
+Author: dm82m
+https://github.com/dm82m/hass-Deltasol-KM2
+
+The responses are included in the diagnostics download, so problems with a
+device in the field can be replayed offline with scripts/replay_diagnostics.py.
+A response identical to the previous one shares its bytes, an unchanged
+device therefore costs the memory of a single response.
+"""
+
+import datetime
+from collections import deque
+
+
+class DeltasolCapture:
+    """The last raw live responses of a device with their timing."""
+
+    def __init__(self, size: int, max_bytes: int) -> None:
+        """Initialise capture."""
+        self.responses: deque[dict] = deque(maxlen=size)
+        # Bodies larger than this are not kept, only their metadata
+        self.max_bytes = max_bytes
+
+    def add(
+        self,
+        source: str,
+        status: int,
+        body: bytes | None,
+        parsed: bool,
+        timings: dict[str, float | None],
+    ) -> None:
+        """Add a response, body is None if it exceeded max_bytes."""
+        if self.responses and self.responses[-1]["body"] == body:
+            body = self.responses[-1]["body"]
+        self.responses.append(
+            {
+                "time": datetime.datetime.now(datetime.UTC).isoformat(),
+                "source": source,
+                "status": status,
+                # False if the body or the device timestamp was unchanged,
+                # the body was then received without being fully parsed
+                "parsed": parsed,
+                "timings_ms": {
+                    phase: None if seconds is None else round(seconds * 1000, 2)
+                    for phase, seconds in timings.items()
+                },
+                "body": body,
+            }
+        )
+
+    def as_list(self) -> list[dict]:
+        """Return the responses, oldest first, with the bodies as text."""
+        return [
+            {
+                **response,
+                "body": None
+                if response["body"] is None
+                else response["body"].decode("utf-8", errors="replace"),
+            }
+            for response in self.responses
+        ]
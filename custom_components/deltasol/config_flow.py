@@ -2,11 +2,15 @@
 
 from __future__ import annotations
 
+import asyncio
+import ipaddress
 import logging
+import os
 from datetime import timedelta
 from typing import Any
 
 import voluptuous as vol
+from homeassistant.components.network import async_get_source_ip
 from homeassistant.config_entries import ConfigFlow, ConfigFlowResult
 from homeassistant.const import (
     CONF_API_KEY,
@@ -19,23 +23,57 @@ from homeassistant.const import (
 from homeassistant.core import HomeAssistant
 from homeassistant.exceptions import HomeAssistantError, IntegrationError
 from homeassistant.helpers import config_validation as cv
+from homeassistant.helpers.aiohttp_client import async_get_clientsession
+from homeassistant.helpers.selector import (
+    SelectOptionDict,
+    SelectSelector,
+    SelectSelectorConfig,
+)
 
 from .const import (
+    CONF_ADAPTIVE_POLLING,
+    CONF_BACKFILL,
+    CONF_DEADBANDS,
+    CONF_DEVICE,
+    CONF_EXCLUDE,
+    CONF_INCLUDE,
+    CONF_SAMPLE_INTERVAL,
+    CONF_SUBNET,
+    CONF_TRANSPORT,
+    CONF_VSF_PATH,
     DEFAULT_PORT,
     DEFAULT_SCAN_INTERVAL,
+    DEFAULT_TIMEOUT,
     DEFAULT_USERNAME,
+    DEFAULT_VBUS_PASSWORD,
+    DEFAULT_VSF_PATH,
+    DISCOVERY_MAX_ADDRESSES,
+    DISCOVERY_PORTS,
     DOMAIN,
+    MIN_SAMPLE_INTERVAL,
     MIN_SCAN_INTERVAL,
+    TRANSPORT_HTTP,
+    TRANSPORT_VBUS_SERIAL,
+    TRANSPORTS,
 )
-from .deltasolapi import DeltasolApi
+from .deadband import parse_deadbands
+from .deltasolapi import DeltasolApi, DeltasolSelection
+from .discovery import async_discover
+from .vbus import VBusLanClient, VBusSerialClient
+from .vsf import VBusSpecification
 
 _LOGGER = logging.getLogger(__name__)
 
 
+TRANSPORT_SELECTOR = SelectSelector(
+    SelectSelectorConfig(options=TRANSPORTS, translation_key=CONF_TRANSPORT)
+)
+
 STEP_USER_DATA_SCHEMA = vol.Schema(
     {
         vol.Required(CONF_HOST): cv.string,
         vol.Required(CONF_PORT, default=DEFAULT_PORT): cv.port,
+        vol.Required(CONF_TRANSPORT, default=TRANSPORT_HTTP): TRANSPORT_SELECTOR,
     }
 )
 
@@ -51,72 +89,296 @@ STEP_OPTIONS_DATA_SCHEMA = vol.Schema(
         vol.Optional(CONF_SCAN_INTERVAL, default=DEFAULT_SCAN_INTERVAL): vol.All(
             vol.Coerce(int), vol.Range(min=MIN_SCAN_INTERVAL)
         ),
+        vol.Optional(CONF_ADAPTIVE_POLLING, default=False): cv.boolean,
+        vol.Optional(CONF_SAMPLE_INTERVAL, default=0): vol.All(
+            vol.Coerce(int), vol.Range(min=0)
+        ),
+        vol.Optional(CONF_INCLUDE, default=""): cv.string,
+        vol.Optional(CONF_EXCLUDE, default=""): cv.string,
+        vol.Optional(CONF_DEADBANDS, default=""): cv.string,
     }
 )
 
 STEP_DL23OPTIONS_DATA_SCHEMA = STEP_OPTIONS_DATA_SCHEMA.extend(
     {
         vol.Optional(CONF_API_KEY): cv.string,
+        vol.Optional(CONF_BACKFILL, default=False): cv.boolean,
     }
 )
 
+STEP_VBUS_DATA_SCHEMA = vol.Schema(
+    {
+        vol.Required(CONF_PASSWORD, default=DEFAULT_VBUS_PASSWORD): cv.string,
+        vol.Required(CONF_VSF_PATH, default=DEFAULT_VSF_PATH): cv.string,
+        vol.Optional(CONF_DEADBANDS, default=""): cv.string,
+    }
+)
 
-async def validate_input(hass: HomeAssistant, data: dict[str, Any]) -> dict[str, Any]:
-    """Validate the user input allows us to connect."""
+STEP_VBUS_SERIAL_DATA_SCHEMA = vol.Schema(
+    {
+        vol.Required(CONF_VSF_PATH, default=DEFAULT_VSF_PATH): cv.string,
+        vol.Optional(CONF_DEADBANDS, default=""): cv.string,
+    }
+)
 
-    api = DeltasolApi(
-        host=data.get(CONF_HOST),
-        port=data.get(CONF_PORT),
+
+def device_title(api: DeltasolApi) -> str:
+    """Return the title of a detected device."""
+    return f"{api.product_details['name']}@{api.host}:{api.port}"
+
+
+def entry_unique_id(title: str, data: dict[str, Any]) -> str:
+    """Return the unique id of a config entry polling a device.
+
+    Several entries may poll one device for different DL2/DL3 filters or
+    fields. An entry of every field is identified by the device title.
+    """
+    selection = DeltasolSelection(data.get(CONF_INCLUDE), data.get(CONF_EXCLUDE))
+    requested = (
+        DeltasolApi.parse_filters(data.get(CONF_API_KEY)),
+        selection.include,
+        selection.exclude,
     )
+    if not any(requested):
+        return title
+    return "#".join([title, *(",".join(patterns) for patterns in requested)])
+
+
+async def validate_input(
+    hass: HomeAssistant, data: dict[str, Any], api: DeltasolApi | None = None
+) -> dict[str, Any]:
+    """Validate the user input allows us to connect.
+
+    A given api is used instead of a new one, its detected product is kept.
+    """
+
+    if api is None:
+        api = DeltasolApi(
+            session=async_get_clientsession(hass),
+            host=data.get(CONF_HOST),
+            port=data.get(CONF_PORT),
+        )
 
     try:
-        await hass.async_add_executor_job(api.detect_product)
-    except IntegrationError as err:
+        async with asyncio.timeout(DEFAULT_TIMEOUT):
+            await api.detect_product()
+    except (IntegrationError, TimeoutError) as err:
         raise CannotConnect from err
 
     return {
-        "title": f"{api.product_details['name']}@{data.get(CONF_HOST)}:{data.get(CONF_PORT)}",
-        "product": {api.product},
+        "title": device_title(api),
+        "product": api.product,
     }
 
 
-async def validate_auth(hass: HomeAssistant, data: dict[str, Any]) -> bool:
-    """Validates the authentication to the Resol device."""
+async def validate_auth(
+    hass: HomeAssistant, data: dict[str, Any], api: DeltasolApi | None = None
+) -> bool:
+    """Validates the authentication to the Resol device.
+
+    A given api is used with the credentials of data, so the product it has
+    detected already is not detected again.
+    """
 
-    api = DeltasolApi(
+    if api is None:
+        api = DeltasolApi(
+            session=async_get_clientsession(hass),
+            host=data.get(CONF_HOST),
+            port=data.get(CONF_PORT),
+        )
+    api.username = data.get(CONF_USERNAME, None)
+    api.password = data.get(CONF_PASSWORD, None)
+    api.auth_id = None
+
+    try:
+        async with asyncio.timeout(DEFAULT_TIMEOUT):
+            await api.fetch_data()
+    except (IntegrationError, TimeoutError) as err:
+        raise InvalidAuth from err
+
+    return True
+
+
+async def validate_vbus(hass: HomeAssistant, data: dict[str, Any]) -> None:
+    """Validates the VBus Specification File and the VBus connection."""
+
+    try:
+        specification = await hass.async_add_executor_job(
+            VBusSpecification.load, hass.config.path(data.get(CONF_VSF_PATH))
+        )
+    except IntegrationError as err:
+        raise InvalidSpecification from err
+
+    if data.get(CONF_TRANSPORT) == TRANSPORT_VBUS_SERIAL:
+        client = VBusSerialClient(
+            device=data.get(CONF_HOST),
+            specification=specification,
+            on_update=lambda *_: None,
+        )
+        try:
+            fd = await hass.async_add_executor_job(client.open)
+        except OSError as err:
+            raise CannotConnect from err
+        os.close(fd)
+        return
+
+    client = VBusLanClient(
         host=data.get(CONF_HOST),
         port=data.get(CONF_PORT),
-        username=data.get(CONF_USERNAME, None),
-        password=data.get(CONF_PASSWORD, None),
+        password=data.get(CONF_PASSWORD),
+        specification=specification,
+        on_update=lambda *_: None,
     )
-
     try:
-        await hass.async_add_executor_job(api.fetch_data)
+        _, writer = await client.async_connect()
     except IntegrationError as err:
         raise InvalidAuth from err
-
-    return True
+    except (OSError, TimeoutError) as err:
+        raise CannotConnect from err
+    writer.close()
 
 
 class ResolConfigFlow(ConfigFlow, domain=DOMAIN):
     """Handle a config flow for Resol integration."""
 
     VERSION = 1
+    # 2 namespaces the sensor unique ids by the config entry
+    MINOR_VERSION = 2
     _title: str
     _product: str
     _input_data: dict[str, Any]
     _reconfigure_entry = None
+    # Client of the entered or discovered device, reused by all steps
+    _api: DeltasolApi | None = None
+    _discovered: dict[str, DeltasolApi]
+
+    def __probed_api(self, data: dict[str, Any]) -> DeltasolApi:
+        if self._api is None or (self._api.host, self._api.port) != (
+            data.get(CONF_HOST),
+            data.get(CONF_PORT),
+        ):
+            self._api = DeltasolApi(
+                session=async_get_clientsession(self.hass),
+                host=data.get(CONF_HOST),
+                port=data.get(CONF_PORT),
+            )
+        return self._api
 
     async def async_step_user(
         self, user_input: dict[str, Any] | None = None
     ) -> ConfigFlowResult:
-        """Handle the initial step."""
+        """Handle the initial step, searching the network or entering an address."""
+
+        return self.async_show_menu(step_id="user", menu_options=["discover", "manual"])
+
+    async def async_step_discover(
+        self, user_input: dict[str, Any] | None = None
+    ) -> ConfigFlowResult:
+        """Handle the discovery step, searching a subnet for devices."""
 
         errors: dict[str, str] = {}
 
         if user_input is not None:
             try:
-                info = await validate_input(self.hass, user_input)
+                network = ipaddress.ip_network(user_input[CONF_SUBNET], strict=False)
+            except ValueError:
+                network = None
+            if network is None or network.num_addresses > DISCOVERY_MAX_ADDRESSES:
+                errors["base"] = "invalid_subnet"
+            else:
+                found = await async_discover(
+                    async_get_clientsession(self.hass),
+                    network.hosts(),
+                    DISCOVERY_PORTS,
+                )
+                configured = {
+                    unique_id.partition("#")[0]
+                    for unique_id in self._async_current_ids()
+                    if unique_id
+                }
+                self._discovered = {
+                    f"{api.host}:{api.port}": api
+                    for api in found
+                    if device_title(api) not in configured
+                }
+                if self._discovered:
+                    return await self.async_step_discovered()
+                errors["base"] = "no_devices_found"
+
+        subnet = ""
+        try:
+            source_ip = await async_get_source_ip(self.hass)
+            subnet = str(ipaddress.ip_network(f"{source_ip}/24", strict=False))
+        except (HomeAssistantError, ValueError):
+            _LOGGER.debug("Could not determine the local subnet")
+
+        return self.async_show_form(
+            step_id="discover",
+            data_schema=vol.Schema(
+                {vol.Required(CONF_SUBNET, default=subnet): cv.string}
+            ),
+            errors=errors,
+        )
+
+    async def async_step_discovered(
+        self, user_input: dict[str, Any] | None = None
+    ) -> ConfigFlowResult:
+        """Handle the choice of a discovered device."""
+
+        if user_input is not None:
+            self._api = self._discovered[user_input[CONF_DEVICE]]
+            return await self.async_step_manual(
+                {
+                    CONF_HOST: self._api.host,
+                    CONF_PORT: self._api.port,
+                    CONF_TRANSPORT: TRANSPORT_HTTP,
+                }
+            )
+
+        options = [
+            SelectOptionDict(
+                value=key, label=f"{api.product_details['name']} ({api.product}) {key}"
+            )
+            for key, api in self._discovered.items()
+        ]
+        return self.async_show_form(
+            step_id="discovered",
+            data_schema=vol.Schema(
+                {
+                    vol.Required(CONF_DEVICE): SelectSelector(
+                        SelectSelectorConfig(options=options)
+                    )
+                }
+            ),
+        )
+
+    async def async_step_manual(
+        self, user_input: dict[str, Any] | None = None
+    ) -> ConfigFlowResult:
+        """Handle entering the address of a device."""
+
+        errors: dict[str, str] = {}
+
+        if (
+            user_input is not None
+            and user_input.get(CONF_TRANSPORT, TRANSPORT_HTTP) != TRANSPORT_HTTP
+        ):
+            # VBus streams are not auto detected, their connection is validated
+            if user_input[CONF_TRANSPORT] == TRANSPORT_VBUS_SERIAL:
+                self._title = f"VBus@{user_input[CONF_HOST]}"
+            else:
+                self._title = f"VBus@{user_input[CONF_HOST]}:{user_input[CONF_PORT]}"
+            if not self._reconfigure_entry:
+                await self.async_set_unique_id(self._title)
+                self._abort_if_unique_id_configured()
+            self._input_data = user_input
+            return await self.async_step_vbus()
+
+        if user_input is not None:
+            try:
+                info = await validate_input(
+                    self.hass, user_input, self.__probed_api(user_input)
+                )
             except CannotConnect:
                 errors["base"] = "cannot_connect"
             except Exception:  # pylint: disable=broad-except
@@ -124,19 +386,16 @@ class ResolConfigFlow(ConfigFlow, domain=DOMAIN):
                 errors["base"] = "unknown"
 
             if "base" not in errors:
-                if not self._reconfigure_entry:
-                    await self.async_set_unique_id(info.get("title"))
-                    self._abort_if_unique_id_configured()
-
+                # The unique id is set with the requested filters and fields
                 self._title = info["title"]
                 self._product = info["product"]
                 self._input_data = user_input
                 try:
-                    await validate_auth(self.hass, user_input)
+                    await validate_auth(self.hass, user_input, self._api)
                 except InvalidAuth:
                     return await self.async_step_auth()
 
-                return await self.async_step_options()
+                return await self.__async_step_product_options()
 
         schema = STEP_USER_DATA_SCHEMA
         if self._reconfigure_entry:
@@ -149,11 +408,44 @@ class ResolConfigFlow(ConfigFlow, domain=DOMAIN):
                         CONF_PORT,
                         default=self._reconfigure_entry.data.get(CONF_PORT),
                     ): cv.port,
+                    vol.Required(
+                        CONF_TRANSPORT,
+                        default=self._reconfigure_entry.data.get(
+                            CONF_TRANSPORT, TRANSPORT_HTTP
+                        ),
+                    ): TRANSPORT_SELECTOR,
                 }
             )
             schema = STEP_USER_DATA_SCHEMA_RECON
 
-        return self.async_show_form(step_id="user", data_schema=schema, errors=errors)
+        return self.async_show_form(step_id="manual", data_schema=schema, errors=errors)
+
+    async def __async_step_product_options(self) -> ConfigFlowResult:
+        if self._product in ["dl2", "dl3"]:
+            return await self.async_step_dl23options()
+        return await self.async_step_options()
+
+    async def __async_finish(self) -> ConfigFlowResult:
+        """Create the entry, or update the reconfigured one."""
+        if not self._reconfigure_entry:
+            await self.async_set_unique_id(
+                entry_unique_id(self._title, self._input_data)
+            )
+            self._abort_if_unique_id_configured()
+            return self.async_create_entry(title=self._title, data=self._input_data)
+
+        data = {**self._reconfigure_entry.data, **self._input_data}
+        unique_id = entry_unique_id(self._title, data)
+        if unique_id != self._reconfigure_entry.unique_id:
+            # Another entry may already poll the new device, filters or fields
+            await self.async_set_unique_id(unique_id)
+            self._abort_if_unique_id_configured()
+        return self.async_update_reload_and_abort(
+            self._reconfigure_entry,
+            unique_id=unique_id,
+            data=data,
+            reason="reconfigure_successful",
+        )
 
     async def async_step_auth(
         self, user_input: dict[str, Any] | None = None
@@ -166,7 +458,7 @@ class ResolConfigFlow(ConfigFlow, domain=DOMAIN):
             user_input.update(self._input_data)
 
             try:
-                await validate_auth(self.hass, user_input)
+                await validate_auth(self.hass, user_input, self._api)
             except InvalidAuth:
                 errors["base"] = "invalid_auth"
             except Exception:  # pylint: disable=broad-except
@@ -175,11 +467,7 @@ class ResolConfigFlow(ConfigFlow, domain=DOMAIN):
 
             if "base" not in errors:
                 self._input_data.update(user_input)
-
-                if self._product in ["dl2", "dl3"]:
-                    return await self.async_step_dl23options()
-                else:
-                    return await self.async_step_options()
+                return await self.__async_step_product_options()
 
         schema = STEP_AUTH_DATA_SCHEMA
         if self._reconfigure_entry:
@@ -208,17 +496,11 @@ class ResolConfigFlow(ConfigFlow, domain=DOMAIN):
     ) -> ConfigFlowResult:
         """Handle the final options step."""
 
-        if user_input is not None:
+        errors: dict[str, str] = {}
+
+        if user_input is not None and self.__validate_options(user_input, errors):
             self._input_data.update(user_input)
-            if not self._reconfigure_entry:
-                return self.async_create_entry(title=self._title, data=self._input_data)
-            else:
-                return self.async_update_reload_and_abort(
-                    self._reconfigure_entry,
-                    unique_id=self._reconfigure_entry.unique_id,
-                    data={**self._reconfigure_entry.data, **self._input_data},
-                    reason="reconfigure_successful",
-                )
+            return await self.__async_finish()
 
         schema = STEP_OPTIONS_DATA_SCHEMA
         if self._reconfigure_entry:
@@ -230,6 +512,30 @@ class ResolConfigFlow(ConfigFlow, domain=DOMAIN):
                             CONF_SCAN_INTERVAL, DEFAULT_SCAN_INTERVAL
                         ),
                     ): vol.All(vol.Coerce(int), vol.Range(min=MIN_SCAN_INTERVAL)),
+                    vol.Optional(
+                        CONF_ADAPTIVE_POLLING,
+                        default=self._reconfigure_entry.data.get(
+                            CONF_ADAPTIVE_POLLING, False
+                        ),
+                    ): cv.boolean,
+                    vol.Optional(
+                        CONF_SAMPLE_INTERVAL,
+                        default=self._reconfigure_entry.data.get(
+                            CONF_SAMPLE_INTERVAL, 0
+                        ),
+                    ): vol.All(vol.Coerce(int), vol.Range(min=0)),
+                    vol.Optional(
+                        CONF_INCLUDE,
+                        default=self._reconfigure_entry.data.get(CONF_INCLUDE, ""),
+                    ): cv.string,
+                    vol.Optional(
+                        CONF_EXCLUDE,
+                        default=self._reconfigure_entry.data.get(CONF_EXCLUDE, ""),
+                    ): cv.string,
+                    vol.Optional(
+                        CONF_DEADBANDS,
+                        default=self._reconfigure_entry.data.get(CONF_DEADBANDS, ""),
+                    ): cv.string,
                 }
             )
             schema = STEP_OPTIONS_DATA_SCHEMA_RECON
@@ -237,6 +543,7 @@ class ResolConfigFlow(ConfigFlow, domain=DOMAIN):
         return self.async_show_form(
             step_id="options",
             data_schema=schema,
+            errors=errors,
             last_step=True,
         )
 
@@ -245,17 +552,11 @@ class ResolConfigFlow(ConfigFlow, domain=DOMAIN):
     ) -> ConfigFlowResult:
         """Handle the final DL2/DL3 options step."""
 
-        if user_input is not None:
+        errors: dict[str, str] = {}
+
+        if user_input is not None and self.__validate_options(user_input, errors):
             self._input_data.update(user_input)
-            if not self._reconfigure_entry:
-                return self.async_create_entry(title=self._title, data=self._input_data)
-            else:
-                return self.async_update_reload_and_abort(
-                    self._reconfigure_entry,
-                    unique_id=self._reconfigure_entry.unique_id,
-                    data={**self._reconfigure_entry.data, **self._input_data},
-                    reason="reconfigure_successful",
-                )
+            return await self.__async_finish()
 
         schema = STEP_DL23OPTIONS_DATA_SCHEMA
         if self._reconfigure_entry:
@@ -267,10 +568,38 @@ class ResolConfigFlow(ConfigFlow, domain=DOMAIN):
                             CONF_SCAN_INTERVAL, DEFAULT_SCAN_INTERVAL
                         ),
                     ): vol.All(vol.Coerce(int), vol.Range(min=MIN_SCAN_INTERVAL)),
+                    vol.Optional(
+                        CONF_ADAPTIVE_POLLING,
+                        default=self._reconfigure_entry.data.get(
+                            CONF_ADAPTIVE_POLLING, False
+                        ),
+                    ): cv.boolean,
+                    vol.Optional(
+                        CONF_SAMPLE_INTERVAL,
+                        default=self._reconfigure_entry.data.get(
+                            CONF_SAMPLE_INTERVAL, 0
+                        ),
+                    ): vol.All(vol.Coerce(int), vol.Range(min=0)),
+                    vol.Optional(
+                        CONF_INCLUDE,
+                        default=self._reconfigure_entry.data.get(CONF_INCLUDE, ""),
+                    ): cv.string,
+                    vol.Optional(
+                        CONF_EXCLUDE,
+                        default=self._reconfigure_entry.data.get(CONF_EXCLUDE, ""),
+                    ): cv.string,
+                    vol.Optional(
+                        CONF_DEADBANDS,
+                        default=self._reconfigure_entry.data.get(CONF_DEADBANDS, ""),
+                    ): cv.string,
                     vol.Optional(
                         CONF_API_KEY,
                         default=self._reconfigure_entry.data.get(CONF_API_KEY, ""),
                     ): cv.string,
+                    vol.Optional(
+                        CONF_BACKFILL,
+                        default=self._reconfigure_entry.data.get(CONF_BACKFILL, False),
+                    ): cv.boolean,
                 }
             )
             schema = STEP_DL23OPTIONS_DATA_SCHEMA_RECON
@@ -278,9 +607,104 @@ class ResolConfigFlow(ConfigFlow, domain=DOMAIN):
         return self.async_show_form(
             step_id="dl23options",
             data_schema=schema,
+            errors=errors,
             last_step=True,
         )
 
+    async def async_step_vbus(
+        self, user_input: dict[str, Any] | None = None
+    ) -> ConfigFlowResult:
+        """Handle the final VBus stream step."""
+
+        errors: dict[str, str] = {}
+
+        if user_input is not None:
+            user_input.update(self._input_data)
+
+            try:
+                parse_deadbands(user_input.get(CONF_DEADBANDS))
+                await validate_vbus(self.hass, user_input)
+            except ValueError:
+                errors["base"] = "invalid_deadband"
+            except InvalidSpecification:
+                errors["base"] = "invalid_vsf"
+            except InvalidAuth:
+                errors["base"] = "invalid_auth"
+            except CannotConnect:
+                errors["base"] = "cannot_connect"
+            except Exception:  # pylint: disable=broad-except
+                _LOGGER.exception("Unexpected exception")
+                errors["base"] = "unknown"
+
+            if "base" not in errors:
+                self._input_data.update(user_input)
+                if not self._reconfigure_entry:
+                    return self.async_create_entry(
+                        title=self._title, data=self._input_data
+                    )
+                else:
+                    return self.async_update_reload_and_abort(
+                        self._reconfigure_entry,
+                        unique_id=self._reconfigure_entry.unique_id,
+                        data={**self._reconfigure_entry.data, **self._input_data},
+                        reason="reconfigure_successful",
+                    )
+
+        # Serial devices need no password
+        serial = self._input_data.get(CONF_TRANSPORT) == TRANSPORT_VBUS_SERIAL
+        schema = STEP_VBUS_SERIAL_DATA_SCHEMA if serial else STEP_VBUS_DATA_SCHEMA
+        if self._reconfigure_entry:
+            STEP_VBUS_DATA_SCHEMA_RECON = vol.Schema(
+                {
+                    vol.Required(
+                        CONF_VSF_PATH,
+                        default=self._reconfigure_entry.data.get(
+                            CONF_VSF_PATH, DEFAULT_VSF_PATH
+                        ),
+                    ): cv.string,
+                    vol.Optional(
+                        CONF_DEADBANDS,
+                        default=self._reconfigure_entry.data.get(CONF_DEADBANDS, ""),
+                    ): cv.string,
+                }
+            )
+            if not serial:
+                STEP_VBUS_DATA_SCHEMA_RECON = STEP_VBUS_DATA_SCHEMA_RECON.extend(
+                    {
+                        vol.Required(
+                            CONF_PASSWORD,
+                            default=self._reconfigure_entry.data.get(
+                                CONF_PASSWORD, DEFAULT_VBUS_PASSWORD
+                            ),
+                        ): cv.string,
+                    }
+                )
+            schema = STEP_VBUS_DATA_SCHEMA_RECON
+
+        return self.async_show_form(
+            step_id="vbus",
+            data_schema=schema,
+            errors=errors,
+            last_step=True,
+        )
+
+    @staticmethod
+    def __validate_options(user_input: dict[str, Any], errors: dict[str, str]) -> bool:
+        try:
+            parse_deadbands(user_input.get(CONF_DEADBANDS))
+        except ValueError:
+            errors["base"] = "invalid_deadband"
+            return False
+        sample_interval = user_input.get(CONF_SAMPLE_INTERVAL, 0)
+        if sample_interval and not (
+            MIN_SAMPLE_INTERVAL
+            <= sample_interval
+            < user_input.get(CONF_SCAN_INTERVAL, DEFAULT_SCAN_INTERVAL)
+        ):
+            errors["base"] = "invalid_sample_interval"
+            return False
+        return True
+
     async def async_step_reconfigure(
         self, user_input: dict[str, Any] | None = None
     ) -> ConfigFlowResult:
@@ -288,7 +712,7 @@ class ResolConfigFlow(ConfigFlow, domain=DOMAIN):
 
         self._reconfigure_entry = self._get_reconfigure_entry()
 
-        return await self.async_step_user()
+        return await self.async_step_manual()
 
     async def async_step_import(self, import_data):
         """Import config from configuration.yaml.
@@ -329,19 +753,19 @@ class ResolConfigFlow(ConfigFlow, domain=DOMAIN):
             _LOGGER.debug(
                 "No valid configuration found for import, delegating to user step"
             )
-            return await self.async_step_user(user_input=user_input)
+            return await self.async_step_manual(user_input=user_input)
 
         try:
             info = await validate_input(self.hass, user_input)
             await validate_auth(self.hass, user_input)
-            await self.async_set_unique_id(info.get("title"))
+            await self.async_set_unique_id(entry_unique_id(info["title"], user_input))
             self._abort_if_unique_id_configured()
             return self.async_create_entry(title=info.get("title"), data=user_input)
         except (CannotConnect, InvalidAuth):
             _LOGGER.debug(
                 "Error connecting to Resol using configuration found for import, delegating to user step"
             )
-            return await self.async_step_user(user_input=user_input)
+            return await self.async_step_manual(user_input=user_input)
 
 
 class CannotConnect(HomeAssistantError):
@@ -350,3 +774,7 @@ class CannotConnect(HomeAssistantError):
 
 class InvalidAuth(HomeAssistantError):
     """Error to indicate there is invalid auth."""
+
+
+class InvalidSpecification(HomeAssistantError):
+    """Error to indicate the VBus Specification File is invalid."""
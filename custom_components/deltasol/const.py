@@ -9,3 +9,96 @@ MIN_SCAN_INTERVAL = 60
 
 DEFAULT_PORT = 80
 DEFAULT_USERNAME = "admin"
+
+# Seconds a KM2 JSON-RPC session (authId) is reused before logging in again
+KM2_SESSION_MAX_AGE = 600
+
+# Seconds a poll is shared with other config entries of the same device
+SHARED_POLL_MAX_AGE = 10
+
+# Storage of the last known device/layout snapshot for instant startup
+STORAGE_VERSION = 1
+STORAGE_SAVE_DELAY = 300
+
+CONF_ADAPTIVE_POLLING = "adaptive_polling"
+# Comma separated patterns of the fields to parse and to leave out
+CONF_INCLUDE = "include"
+CONF_EXCLUDE = "exclude"
+# Comma separated pattern=threshold pairs of insignificant changes
+CONF_DEADBANDS = "deadbands"
+# Seconds after which a value within its deadband is published anyway
+DEADBAND_MAX_AGE = 3600
+
+# Seconds between samples aggregated to one publish per scan interval, 0 is off
+CONF_SAMPLE_INTERVAL = "sample_interval"
+MIN_SAMPLE_INTERVAL = 5
+# Units of measurements that are averaged, other fields keep their last value
+AGGREGATE_MEAN_UNITS = ["°C", "K", "W", "kW", "l/h", "bar", "%", "%RH"]
+
+# Adaptive polling: reference change rates per minute that count as "fast"
+ADAPTIVE_VOLATILITY_RATES = {
+    "°C": 0.5,
+    "K": 0.5,
+    "l/h": 20,
+    "%": 10,
+    "W": 100,
+    "bar": 0.1,
+}
+ADAPTIVE_FLAT_SCORE = 0.2
+ADAPTIVE_SHORTEN_FACTOR = 0.5
+ADAPTIVE_LENGTHEN_FACTOR = 1.5
+ADAPTIVE_MAX_FACTOR = 4
+BACKOFF_MAX_INTERVAL = 3600
+
+# Seconds to poll after the expected device data refresh
+ALIGN_MARGIN = 2
+# Seconds two refresh intervals may differ and still be the same multiple
+ALIGN_TOLERANCE = 2
+# Shorter common refresh periods mean the device refreshes irregularly
+ALIGN_MIN_PERIOD = 5
+
+CONF_TRANSPORT = "transport"
+CONF_VSF_PATH = "vsf_path"
+
+# http polls the device or json-live-data-server, the others stream VBus
+TRANSPORT_HTTP = "http"
+TRANSPORT_VBUS_LAN = "vbus_lan"
+TRANSPORT_VBUS_SERIAL = "vbus_serial"
+TRANSPORTS = [TRANSPORT_HTTP, TRANSPORT_VBUS_LAN, TRANSPORT_VBUS_SERIAL]
+
+DEFAULT_VBUS_LAN_PORT = 7053
+DEFAULT_VBUS_PASSWORD = "vbus"
+# Relative to the Home Assistant configuration directory
+DEFAULT_VSF_PATH = "vbus_specification.vsf"
+VBUS_RECONNECT_INTERVAL = 30
+VBUS_SERIAL_BAUDRATE = 9600
+# Seconds to collect the packets of a burst into one coordinator update
+VBUS_COALESCE_DELAY = 0.5
+
+# DL2/DL3 filters fetched at the same time if several are configured
+DLX_FILTER_PARALLELISM = 3
+
+# Discovery of devices and json-live-data-servers in the local network
+CONF_SUBNET = "subnet"
+CONF_DEVICE = "device"
+DISCOVERY_PORTS = [80, 3333]
+DISCOVERY_PARALLELISM = 64
+DISCOVERY_TIMEOUT = 2
+DISCOVERY_MAX_ADDRESSES = 1024
+
+CONF_BACKFILL = "backfill"
+# Resolution of the DL2/DL3 log download aggregated to hourly statistics
+BACKFILL_SIEVE_INTERVAL = 300
+# Hours of log downloaded and imported per request
+BACKFILL_CHUNK_HOURS = 24
+BACKFILL_MAX_DAYS = 30
+# Units of sensors with measurement statistics (mean, min, max)
+BACKFILL_UNITS = ["°C", "W"]
+STREAM_CHUNK_SIZE = 65536
+
+# Number of recent polls the phase timings are kept for
+TIMING_WINDOW = 100
+
+# Number and maximum size of the raw responses kept for the diagnostics
+DIAGNOSTICS_RESPONSES = 3
+DIAGNOSTICS_MAX_RESPONSE_BYTES = 512 * 1024
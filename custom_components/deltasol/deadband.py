@@ -0,0 +1,105 @@
+"""
+Deadbands suppressing insignificant sensor updates.
+Author: dm82m
+https://github.com/dm82m/hass-Deltasol-KM2
+
+Deadbands are configured as comma separated pattern=threshold pairs, e.g.
+"°C=0.2, l/h=5, 00_0010_7E11_10_0100__000_2_0=0.5". A pattern matching the
+unique id or field id of a sensor overrides a pattern matching its unit.
+"""
+
+from fnmatch import fnmatchcase
+
+from .deltasolapi import DeltasolData, DeltasolField, DeltasolLayout
+
+
+def parse_deadbands(text: str | None) -> tuple[tuple[str, float], ...]:
+    """Return the (pattern, threshold) pairs of a deadband option.
+
+    Raises ValueError if an entry is not a pattern=threshold pair.
+    """
+    deadbands = []
+    for entry in (text or "").split(","):
+        if not entry.strip():
+            continue
+        pattern, separator, threshold = entry.rpartition("=")
+        if not separator or not pattern.strip():
+            raise ValueError(f"Invalid deadband {entry.strip()!r}")
+        deadbands.append((pattern.strip().lower(), abs(float(threshold))))
+    return tuple(deadbands)
+
+
+class DeadbandFilter:
+    """Tracks the values last published per field and decides which changed.
+
+    A numeric value is only published again once it differs from the last
+    published one by at least the threshold of its field, or once the last
+    publish is older than max_age seconds.
+    """
+
+    def __init__(self, deadbands: tuple[tuple[str, float], ...], max_age: float):
+        """Initialise filter."""
+        self.deadbands = deadbands
+        self.max_age = max_age
+        self._layout: DeltasolLayout | None = None
+        self._thresholds: list[float | None] = []
+        self._published: list = []
+        self._published_at: list[float] = []
+        self.suppressed = 0
+
+    def threshold(self, field: DeltasolField) -> float | None:
+        """Return the deadband of a field, None if it has none."""
+        unit = None
+        for pattern, threshold in self.deadbands:
+            if fnmatchcase(field.unique_id.lower(), pattern) or fnmatchcase(
+                field.unique_id.split("__")[-1].lower(), pattern
+            ):
+                return threshold
+            if unit is None and fnmatchcase(field.unit.lower(), pattern):
+                unit = threshold
+        return unit
+
+    def reset(self, data: DeltasolData, now: float) -> None:
+        """Record all values of data as published."""
+        if data.layout is not self._layout:
+            self._layout = data.layout
+            self._thresholds = [self.threshold(field) for field in data.layout.fields]
+        self._published = list(data.values)
+        self._published_at = [now] * len(data.values)
+
+    def changed(
+        self, old: DeltasolData | None, new: DeltasolData, now: float
+    ) -> set[str] | None:
+        """Return the unique_ids to publish, None if all are to be published."""
+        if old is new:
+            return set()
+        if (
+            old is None
+            or old.layout is not new.layout
+            or new.layout is not self._layout
+        ):
+            self.reset(new, now)
+            return None
+
+        changed = set()
+        published = self._published
+        for field, threshold, value in zip(
+            new.layout.fields, self._thresholds, new.values
+        ):
+            slot = field.slot
+            last = published[slot]
+            if value == last:
+                continue
+            if (
+                threshold is not None
+                and isinstance(value, (int, float))
+                and isinstance(last, (int, float))
+                and abs(value - last) < threshold
+                and now - self._published_at[slot] < self.max_age
+            ):
+                self.suppressed += 1
+                continue
+            published[slot] = value
+            self._published_at[slot] = now
+            changed.add(field.unique_id)
+        return changed
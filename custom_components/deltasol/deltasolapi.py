@@ -4,14 +4,34 @@ Author: dm82m
 https://github.com/dm82m/hass-Deltasol-KM2
 """
 
+import asyncio
 import datetime
+import hashlib
+import json
 import logging
 import re
+import sys
+import time
+import zlib
 from collections import namedtuple
+from contextlib import asynccontextmanager
+from fnmatch import fnmatchcase
 
-import requests
+from aiohttp import ClientError, ClientPayloadError, ClientResponse, ClientSession
 from homeassistant.exceptions import IntegrationError
-from requests.exceptions import RequestException
+
+from .capture import DeltasolCapture
+from .const import (
+    BACKFILL_SIEVE_INTERVAL,
+    DIAGNOSTICS_MAX_RESPONSE_BYTES,
+    DIAGNOSTICS_RESPONSES,
+    DLX_FILTER_PARALLELISM,
+    KM2_SESSION_MAX_AGE,
+    STREAM_CHUNK_SIZE,
+    TIMING_WINDOW,
+)
+from .streamjson import JsonStream, JsonStreamError
+from .timing import DeltasolTimings
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -20,86 +40,712 @@ DeltasolEndpoint = namedtuple(
     "name, value, unit, description, bus_dest, bus_src, product_details",
 )
 
+# Request compressed bodies from devices and servers that support it
+ACCEPT_ENCODING = {"Accept-Encoding": "gzip, deflate"}
+# Window bits of zlib detecting a gzip or zlib header
+DECOMPRESS_WBITS = 32 + zlib.MAX_WBITS
+
+# Served by KM2, DL2/DL3 and json-live-data-server, used to detect the product
+DEVICE_INFORMATION_PATH = "/cgi-bin/get_resol_device_information"
+
+# Resol devices count date values in seconds since 2001-01-01
+EPOCH_START = datetime.datetime(2001, 1, 1, 0, 0, 0, 0, tzinfo=datetime.UTC)
+
+
+class DeltasolField:
+    """Static description of one field of the device's header layout."""
+
+    __slots__ = (
+        "bus_dest",
+        "bus_src",
+        "description",
+        "field_index",
+        "header_index",
+        "is_date",
+        "name",
+        "slot",
+        "unique_id",
+        "unit",
+    )
+
+    def __init__(
+        self,
+        slot,
+        header_index,
+        field_index,
+        unique_id,
+        name,
+        unit,
+        description,
+        bus_dest,
+        bus_src,
+    ) -> None:
+        """Initialise field descriptor."""
+        self.slot = slot
+        self.header_index = header_index
+        self.field_index = field_index
+        self.unique_id = unique_id
+        self.name = sys.intern(name.replace(" ", "_").lower())
+        self.unit = sys.intern(unit.strip())
+        self.description = sys.intern(description)
+        self.bus_dest = sys.intern(bus_dest)
+        self.bus_src = sys.intern(bus_src)
+        self.is_date = "date" in name
+
+
+class DeltasolSelection:
+    """Include and exclude patterns choosing the fields to be parsed.
+
+    Patterns are comma separated, case insensitive shell-style wildcards
+    matched against the header id, field id, unique id, source device and
+    unit of a field. Without include patterns every field is included.
+    """
+
+    __slots__ = ("exclude", "include")
+
+    def __init__(self, include: str | None = None, exclude: str | None = None) -> None:
+        """Initialise selection."""
+        self.include = self.patterns(include)
+        self.exclude = self.patterns(exclude)
+
+    def __bool__(self) -> bool:
+        return bool(self.include or self.exclude)
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, DeltasolSelection) and (
+            self.include,
+            self.exclude,
+        ) == (other.include, other.exclude)
+
+    def __hash__(self) -> int:
+        return hash((self.include, self.exclude))
+
+    @staticmethod
+    def patterns(text: str | None) -> tuple[str, ...]:
+        """Return the patterns of a comma separated list."""
+        return tuple(
+            pattern.strip().lower()
+            for pattern in (text or "").split(",")
+            if pattern.strip()
+        )
+
+    def selects(self, header_id, field_id, bus_src, unit) -> bool:
+        """Return whether a field is to be parsed."""
+        keys = (
+            header_id.lower(),
+            field_id.lower(),
+            f"{header_id}__{field_id}".lower(),
+            bus_src.lower(),
+            unit.strip().lower(),
+        )
+        if self.include and not any(
+            fnmatchcase(key, pattern) for pattern in self.include for key in keys
+        ):
+            return False
+        return not any(
+            fnmatchcase(key, pattern) for pattern in self.exclude for key in keys
+        )
+
+    @staticmethod
+    def union(selections) -> "DeltasolSelection | DeltasolSelectionUnion":
+        """Return a selection of the fields chosen by any of the selections."""
+        unique = {}
+        for selection in selections:
+            if not selection:
+                # Chooses every field
+                return DeltasolSelection()
+            for part in getattr(selection, "selections", (selection,)):
+                unique[part] = None
+        if len(unique) == 1:
+            return next(iter(unique))
+        return DeltasolSelectionUnion(unique)
+
+
+class DeltasolSelectionUnion:
+    """Fields chosen by any of several selections, of entries sharing an api."""
+
+    __slots__ = ("selections",)
+
+    def __init__(self, selections) -> None:
+        """Initialise union."""
+        self.selections = frozenset(selections)
+
+    def __bool__(self) -> bool:
+        return bool(self.selections)
+
+    def __eq__(self, other) -> bool:
+        return (
+            isinstance(other, DeltasolSelectionUnion)
+            and self.selections == other.selections
+        )
+
+    def __hash__(self) -> int:
+        return hash(self.selections)
+
+    def selects(self, header_id, field_id, bus_src, unit) -> bool:
+        """Return whether any of the selections chooses a field."""
+        return any(
+            selection.selects(header_id, field_id, bus_src, unit)
+            for selection in self.selections
+        )
+
+
+class DeltasolLayout:
+    """Compiled header layout, built once and shared by all polls using it.
+
+    Fields not chosen by the selection are left out, so their values are never
+    converted or stored.
+    """
+
+    __slots__ = ("fields", "fingerprint", "header_fields", "header_offsets", "slots")
+
+    def __init__(self, fingerprint, selection: DeltasolSelection | None = None) -> None:
+        """Compile the layout described by a header fingerprint."""
+        self.fingerprint = fingerprint
+        fields = []
+        offsets = []
+        offset = 0
+        for iHeader, header in enumerate(fingerprint):
+            header_id, description, bus_dest, bus_src, header_fields = header
+            _LOGGER.debug(f"Found header[{iHeader}] now compiling it ...")
+            # Position of the header's first field among all fields
+            offsets.append(offset)
+            offset += len(header_fields)
+            for iField, (field_id, name, unit) in enumerate(header_fields):
+                if selection and not selection.selects(
+                    header_id, field_id, bus_src, unit
+                ):
+                    continue
+                fields.append(
+                    DeltasolField(
+                        slot=len(fields),
+                        header_index=iHeader,
+                        field_index=iField,
+                        unique_id=header_id + "__" + field_id,
+                        name=name,
+                        unit=unit,
+                        description=description,
+                        bus_dest=bus_dest,
+                        bus_src=bus_src,
+                    )
+                )
+        self.fields = tuple(fields)
+        self.header_offsets = tuple(offsets)
+        self.slots = {field.unique_id: field.slot for field in fields}
+        header_fields = [[] for _ in fingerprint]
+        for field in fields:
+            header_fields[field.header_index].append(field)
+        self.header_fields = tuple(map(tuple, header_fields))
+
+    @staticmethod
+    def fingerprint_of(headers):
+        """Return the fingerprint of the headers of a device response."""
+        return tuple(DeltasolLayout.header_fingerprint(header) for header in headers)
+
+    @staticmethod
+    def merge_fingerprints(fingerprints) -> tuple:
+        """Return one fingerprint holding every field of the given ones once.
+
+        Headers with the same id are combined, of fields with the same id the
+        first one is kept.
+        """
+        headers = {}
+        for fingerprint in fingerprints:
+            for header_id, description, bus_dest, bus_src, fields in fingerprint:
+                merged = headers.setdefault(
+                    header_id, (description, bus_dest, bus_src, {})
+                )
+                for field in fields:
+                    merged[3].setdefault(field[0], field)
+        return tuple(
+            (header_id, description, bus_dest, bus_src, tuple(fields.values()))
+            for header_id, (description, bus_dest, bus_src, fields) in headers.items()
+        )
+
+    @staticmethod
+    def header_fingerprint(header) -> tuple:
+        """Return the fingerprint of one header of a device response."""
+        return (
+            header["id"],
+            header["description"],
+            header["destination_name"],
+            header["source_name"],
+            tuple(
+                (field["id"], field["name"], field["unit"])
+                for field in header["fields"]
+            ),
+        )
+
+
+class DeltasolData:
+    """Values of one poll, indexed by the field slots of its layout."""
+
+    __slots__ = ("layout", "product_details", "values")
+
+    def __init__(self, layout: DeltasolLayout, values: list, product_details) -> None:
+        """Initialise data."""
+        self.layout = layout
+        self.values = values
+        self.product_details = product_details
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def __contains__(self, unique_id) -> bool:
+        return unique_id in self.layout.slots
+
+    def __getitem__(self, unique_id) -> DeltasolEndpoint:
+        return self.endpoint(self.layout.fields[self.layout.slots[unique_id]])
+
+    def endpoint(self, field: DeltasolField) -> DeltasolEndpoint:
+        """Return the given field as DeltasolEndpoint."""
+        return DeltasolEndpoint(
+            name=field.name,
+            value=self.values[field.slot],
+            unit=field.unit,
+            description=field.description,
+            bus_dest=field.bus_dest,
+            bus_src=field.bus_src,
+            product_details=self.product_details,
+        )
+
+    def items(self):
+        """Iterate over unique_id, DeltasolEndpoint pairs."""
+        for field in self.layout.fields:
+            yield field.unique_id, self.endpoint(field)
+
+    def changed_ids(self, old: "DeltasolData | None") -> set[str] | None:
+        """Return the unique_ids whose value differs from old, None for all."""
+        if old is self:
+            return set()
+        if old is None or old.layout is not self.layout:
+            return None
+        return {
+            field.unique_id
+            for field, old_value, new_value in zip(
+                self.layout.fields, old.values, self.values
+            )
+            if old_value != new_value
+        }
+
+    def as_dict(self) -> dict:
+        """Return a JSON serializable representation."""
+        return {
+            "layout": self.layout.fingerprint,
+            "values": [
+                value.isoformat() if isinstance(value, datetime.datetime) else value
+                for value in self.values
+            ],
+            "product_details": self.product_details,
+        }
+
+    @classmethod
+    def from_dict(
+        cls, data: dict, selection: DeltasolSelection | None = None
+    ) -> "DeltasolData":
+        """Restore data from the representation returned by as_dict.
+
+        selection must be the one the data was stored with.
+        """
+        layout = DeltasolLayout(
+            tuple(
+                (*header[:4], tuple(tuple(field) for field in header[4]))
+                for header in data["layout"]
+            ),
+            selection,
+        )
+        values = [
+            datetime.datetime.fromisoformat(value)
+            if field.is_date and isinstance(value, str)
+            else value
+            for field, value in zip(layout.fields, data["values"])
+        ]
+        return cls(layout, values, data["product_details"])
+
+
+class DeltasolProjection:
+    """Fields of the data of one or more DL2/DL3 filters chosen by a selection.
+
+    Fields of several filters are merged into one layout, of fields with the
+    same unique id the first one is kept. The layout and the slots the values
+    are copied from are compiled once per combination of source layouts, and
+    data of unchanged sources is returned as the same object.
+    """
+
+    __slots__ = ("_data", "_layouts", "_slots", "_sources", "layout", "selection")
+
+    def __init__(self, selection: DeltasolSelection | None = None) -> None:
+        """Initialise projection."""
+        self.selection = selection or DeltasolSelection()
+        self.layout: DeltasolLayout | None = None
+        self._layouts: tuple = ()
+        # (slot in the source data, slot in the projected data) per source
+        self._slots: list[list[tuple[int, int]]] = []
+        self._sources: tuple = ()
+        self._data: DeltasolData | None = None
+
+    def project(self, sources: list[DeltasolData]) -> DeltasolData:
+        """Return the selected fields of the sources as one data."""
+        if len(sources) == 1 and not self.selection:
+            return sources[0]
+        if (
+            self._data is not None
+            and len(sources) == len(self._sources)
+            and all(new is old for new, old in zip(sources, self._sources))
+        ):
+            # No source has new data
+            return self._data
+        self._sources = tuple(sources)
+
+        layouts = tuple(source.layout for source in sources)
+        if layouts != self._layouts:
+            self.__compile(layouts)
+        values = [None] * len(self.layout.fields)
+        for source, slots in zip(sources, self._slots):
+            for slot, projected_slot in slots:
+                values[projected_slot] = source.values[slot]
+        self._data = DeltasolData(self.layout, values, sources[0].product_details)
+        return self._data
+
+    def __compile(self, layouts: tuple) -> None:
+        fingerprint = (
+            layouts[0].fingerprint
+            if len(layouts) == 1
+            else DeltasolLayout.merge_fingerprints(
+                layout.fingerprint for layout in layouts
+            )
+        )
+        if self.layout is None or fingerprint != self.layout.fingerprint:
+            _LOGGER.debug("Source layouts changed, compiling new field layout")
+            self.layout = DeltasolLayout(fingerprint, self.selection)
+        self._layouts = layouts
+        seen = set()
+        self._slots = []
+        for layout in layouts:
+            slots = []
+            for field in layout.fields:
+                projected_slot = self.layout.slots.get(field.unique_id)
+                if projected_slot is not None and field.unique_id not in seen:
+                    seen.add(field.unique_id)
+                    slots.append((field.slot, projected_slot))
+            self._slots.append(slots)
+
 
 class DeltasolApi:
     """Wrapper class for Resol KM1/KM2, DL2/DL2Plus/DL3, VBus/LAN, VBus/USB."""
 
-    def __init__(self, host, port, username=None, password=None, api_key=None) -> None:
+    def __init__(
+        self,
+        session: ClientSession,
+        host,
+        port,
+        username=None,
+        password=None,
+        api_key=None,
+        selection: DeltasolSelection | None = None,
+    ) -> None:
         """Initialise api."""
+        self.session = session
         self.data = None
         self.host = host
         self.port = port
         self.username = username
         self.password = password
         self.api_key = api_key
+        self.selection = selection or DeltasolSelection()
         self.product = None
         self.product_details = None
-
-    def __parse_data(self, response) -> dict[str, DeltasolEndpoint]:
-        data = {}
-
-        for iHeader, header in enumerate(response["headers"]):
-            _LOGGER.debug(f"Found header[{iHeader}] now parsing it ...")
-            for iField, field in enumerate(response["headers"][iHeader]["fields"]):
-                value = response["headersets"][0]["packets"][iHeader]["field_values"][
-                    iField
-                ]["raw_value"]
-                if isinstance(value, float):
-                    value = round(value, 2)
-                if "date" in field["name"]:
-                    epochStart = datetime.datetime(
-                        2001, 1, 1, 0, 0, 0, 0, tzinfo=datetime.timezone.utc
+        self._layout: DeltasolLayout | None = None
+        self.device_timestamp = None
+        # Digest of the raw body self.data was parsed from
+        self._body_digest = None
+        # Live response bytes after and before decompression
+        self.bytes_received = 0
+        self.bytes_transferred = 0
+        # Polls not parsed because of an unchanged body or device timestamp
+        self.short_circuited_polls = 0
+        # Size of the last received live response
+        self.payload_bytes = 0
+        self.timings = DeltasolTimings(TIMING_WINDOW)
+        self.capture = DeltasolCapture(
+            DIAGNOSTICS_RESPONSES, DIAGNOSTICS_MAX_RESPONSE_BYTES
+        )
+        self.auth_id = None
+        self.auth_time = 0.0
+        self.login_count = 0
+        self.session_reuse_count = 0
+        # One api per DL2/DL3 filter if several are fetched at once
+        self._filter_apis: list[DeltasolApi] = []
+        self._projection = DeltasolProjection(self.selection)
+
+    @staticmethod
+    def parse_filters(api_key: str | None) -> list[str]:
+        """Return the DL2/DL3 filter ids of an api key, separated by commas."""
+        return [
+            api_filter.strip()
+            for api_filter in (api_key or "").split(",")
+            if api_filter.strip()
+        ]
+
+    @property
+    def filters(self) -> list[str]:
+        """Return the configured DL2/DL3 filter ids."""
+        return self.parse_filters(self.api_key)
+
+    def select(self, selection: "DeltasolSelection | DeltasolSelectionUnion") -> None:
+        """Parse the fields of another selection from the next poll on."""
+        if selection == self.selection:
+            return
+        self.selection = selection
+        self._layout = None
+        # Data of the previous selection is not returned for unchanged polls
+        self.data = None
+        self._body_digest = None
+        self._filter_apis = []
+        self._projection = DeltasolProjection(selection)
+
+    def restore(self, product, product_details: dict) -> None:
+        """Restore the detected product from a previous run."""
+        self.product = product
+        self.product_details = product_details
+
+    def __use_layout(self, fingerprint) -> None:
+        if self._layout is None or fingerprint != self._layout.fingerprint:
+            _LOGGER.debug("Header layout changed, compiling new field layout")
+            self._layout = DeltasolLayout(fingerprint, self.selection)
+
+    def build_data(self, fingerprint, raw_values: list) -> DeltasolData:
+        """Build data from a header fingerprint and the raw values of its fields.
+
+        Used by the transports that decode VBus themselves instead of parsing
+        a device response.
+        """
+        self.__use_layout(fingerprint)
+
+        values = []
+        offsets = self._layout.header_offsets
+        for field in self._layout.fields:
+            value = raw_values[offsets[field.header_index] + field.field_index]
+            if isinstance(value, float):
+                value = round(value, 2)
+            if field.is_date and value is not None:
+                value = EPOCH_START + datetime.timedelta(0, value)
+            values.append(value)
+
+        self.data = DeltasolData(self._layout, values, self.product_details)
+        return self.data
+
+    @staticmethod
+    def __convert(field: DeltasolField, value):
+        if isinstance(value, float):
+            value = round(value, 2)
+        if field.is_date:
+            value = EPOCH_START + datetime.timedelta(0, value)
+        return value
+
+    async def __body(self, resp: ClientResponse):
+        """Yield the decompressed chunks of a live response.
+
+        Live requests disable the decompression of aiohttp, so the bytes
+        counted as transferred are the ones on the wire.
+        """
+        encoding = resp.headers.get("Content-Encoding", "").lower()
+        decompressor = (
+            zlib.decompressobj(DECOMPRESS_WBITS)
+            if encoding in ("gzip", "deflate")
+            else None
+        )
+        try:
+            async for chunk in resp.content.iter_chunked(STREAM_CHUNK_SIZE):
+                self.bytes_transferred += len(chunk)
+                if decompressor is None or (chunk := decompressor.decompress(chunk)):
+                    yield chunk
+            if decompressor is not None and (chunk := decompressor.flush()):
+                yield chunk
+        except zlib.error as e:
+            raise ClientPayloadError(f"Invalid {encoding} response body - {e}") from e
+
+    async def __read_data(
+        self, resp: ClientResponse, source: str, prefix: str = ""
+    ) -> DeltasolData | None:
+        """Parse a live response, unless it is unchanged since the last poll.
+
+        source names the request in the captured responses, prefix is the
+        path of the object holding headers and headersets. The raw chunks are
+        hashed as they arrive and, up to the maximum size of the diagnostics,
+        only parsed once the body is complete and its digest differs from the
+        previous one. Larger bodies are parsed while they are received, they
+        stop being parsed at an unchanged device timestamp. Only one header or
+        packet is decoded at a time and its values are written straight into
+        the field slots.
+        Returns None if the response holds no headersets.
+        """
+        base = f"{prefix}." if prefix else ""
+        parts = prefix.split(".") if prefix else []
+        headers_path = base + "headers.item"
+        headerset_path = base + "headersets.item"
+        timestamp_path = headerset_path + ".timestamp"
+        packet_path = headerset_path + ".packets.item"
+        stream = JsonStream(
+            descend={
+                *(".".join(parts[:i]) for i in range(1, len(parts) + 1)),
+                base + "headers",
+                base + "headersets",
+                headerset_path,
+                headerset_path + ".packets",
+            }
+        )
+
+        header_fingerprints = []
+        # Packets of the first headerset, kept only until the layout is known
+        packets = []
+        state = {"headerset": -1, "values": None}
+
+        def handle(path, value) -> bool:
+            """Handle an event, return True if the device data is unchanged."""
+            if path == headers_path:
+                header_fingerprints.append(DeltasolLayout.header_fingerprint(value))
+            elif path == headerset_path and value is JsonStream.START:
+                state["headerset"] += 1
+            elif state["headerset"] != 0:
+                # Only the first headerset holds the current data
+                pass
+            elif path == timestamp_path:
+                if value == self.device_timestamp and self.data is not None:
+                    return True
+                self.device_timestamp = value
+            elif path == packet_path:
+                packets.append(value)
+                if header_fingerprints:
+                    fill()
+            return False
+
+        def fill() -> None:
+            values = state["values"]
+            if values is None:
+                self.__use_layout(tuple(header_fingerprints))
+                values = state["values"] = [None] * len(self._layout.fields)
+                state["packet"] = 0
+            for packet in packets:
+                field_values = packet["field_values"]
+                for field in self._layout.header_fields[state["packet"]]:
+                    values[field.slot] = self.__convert(
+                        field, field_values[field.field_index]["raw_value"]
                     )
-                    value = epochStart + datetime.timedelta(0, value)
-                unique_id = header["id"] + "__" + field["id"]
-                data[unique_id] = DeltasolEndpoint(
-                    name=field["name"].replace(" ", "_").lower(),
-                    value=value,
-                    unit=field["unit"].strip(),
-                    description=header["description"],
-                    bus_dest=header["destination_name"],
-                    bus_src=header["source_name"],
-                    product_details=self.product_details,
-                )
-
-        return data
+                state["packet"] += 1
+            packets.clear()
+
+        def parse(chunks) -> bool:
+            """Parse chunks, return True if the device data is unchanged."""
+            return any(
+                handle(path, value)
+                for chunk in chunks
+                for path, value in stream.feed(chunk)
+            )
 
-    def detect_product(self):
+        digest = hashlib.blake2b(digest_size=16)
+        received = 0
+        # Raw chunks not yet parsed, kept for the digest comparison and the
+        # diagnostics, None once the maximum size is exceeded
+        chunks = []
+        receiving = parsing = 0.0
+        mark = time.perf_counter()
+        unchanged = False
+        async for chunk in self.__body(resp):
+            started = time.perf_counter()
+            receiving += started - mark
+            received += len(chunk)
+            digest.update(chunk)
+            if chunks is not None:
+                chunks.append(chunk)
+                if received > self.capture.max_bytes:
+                    # Too large to be kept, parsed while it is received
+                    unchanged = parse(chunks)
+                    chunks = None
+            elif not unchanged:
+                unchanged = parse((chunk,))
+            # The rest of an unchanged response is still read without parsing
+            # it, the keep-alive connection is only reused once it is drained
+            mark = time.perf_counter()
+            parsing += mark - started
+        body_digest = digest.digest()
+        if chunks is not None and body_digest == self._body_digest:
+            # Same body as the one self.data was parsed from
+            unchanged = self.data is not None
+        if not unchanged:
+            unchanged = parse(chunks or ()) or any(
+                handle(path, value) for path, value in stream.close()
+            )
+        parsing += time.perf_counter() - mark
+        self.timings.record("receive", receiving)
+        self.timings.record("parse", parsing)
+        self.capture.add(
+            source,
+            resp.status,
+            None if chunks is None else b"".join(chunks),
+            not unchanged,
+            {
+                "request": self.timings.last["request"],
+                "receive": receiving,
+                "parse": parsing,
+            },
+        )
+
+        self.payload_bytes = received
+        self.bytes_received += received
+        if unchanged:
+            # The device has not refreshed its data since the last poll
+            self._body_digest = body_digest
+            self.short_circuited_polls += 1
+            _LOGGER.debug(
+                f"Device data unchanged since {self.device_timestamp}, "
+                f"{self.short_circuited_polls} poll(s) short-circuited"
+            )
+            return self.data
+        if state["headerset"] < 0:
+            return None
+
+        fill()
+        self.data = DeltasolData(self._layout, state["values"], self.product_details)
+        self._body_digest = body_digest
+        return self.data
+
+    @staticmethod
+    def parse_device_information(text: str) -> tuple[str, dict] | None:
+        """Return product and product details of a device information response.
+
+        Returns None if the response names no product.
+        """
+        matches = re.search(r'product\s=\s["](.*?)["]', text)
+        if not matches:
+            return None
+        return matches.group(1).lower(), {
+            "vendor": re.search(r'vendor\s=\s["](.*?)["]', text).group(1),
+            "serial": re.search(r'serial\s=\s["](.*?)["]', text).group(1),
+            "version": re.search(r'version\s=\s["](.*?)["]', text).group(1),
+            "build": re.search(r'build\s=\s["](.*?)["]', text).group(1),
+            "name": re.search(r'name\s=\s["](.*?)["]', text).group(1),
+            "features": re.search(r'features\s=\s["](.*?)["]', text).group(1),
+        }
+
+    async def detect_product(self):
         if self.product is not None:
             return self.product
 
         try:
-            url = f"http://{self.host}:{self.port}/cgi-bin/get_resol_device_information"
+            url = f"http://{self.host}:{self.port}{DEVICE_INFORMATION_PATH}"
             _LOGGER.info(f"Auto detecting Resol product from {url}")
-            response = requests.request("GET", url)
-            if response.status_code == 200:
-                _LOGGER.debug(f"response: {response.text}")
-                matches = re.search(r'product\s=\s["](.*?)["]', response.text)
-                if matches:
-                    self.product = matches.group(1).lower()
+            with self.timings.measure("detect"):
+                async with self.session.get(url) as response:
+                    status = response.status
+                    text = await response.text()
+            if status == 200:
+                _LOGGER.debug("response: %s", text)
+                detected = self.parse_device_information(text)
+                if detected:
+                    self.product, self.product_details = detected
                     _LOGGER.info(f"Detected Resol product: {self.product}")
-                    product_details = {
-                        "vendor": re.search(
-                            r'vendor\s=\s["](.*?)["]', response.text
-                        ).group(1),
-                        "serial": re.search(
-                            r'serial\s=\s["](.*?)["]', response.text
-                        ).group(1),
-                        "version": re.search(
-                            r'version\s=\s["](.*?)["]', response.text
-                        ).group(1),
-                        "build": re.search(
-                            r'build\s=\s["](.*?)["]', response.text
-                        ).group(1),
-                        "name": re.search(r'name\s=\s["](.*?)["]', response.text).group(
-                            1
-                        ),
-                        "features": re.search(
-                            r'features\s=\s["](.*?)["]', response.text
-                        ).group(1),
-                    }
-                    self.product_details = product_details
-                    _LOGGER.debug(f"Product Details: {product_details}")
+                    _LOGGER.debug(f"Product Details: {self.product_details}")
                 else:
                     error = "Your device was reachable but we could not correctly detect it, please file an issue at: https://github.com/dm82m/hass-Deltasol-KM2/issues/new/choose"
                     _LOGGER.error(error)
@@ -109,35 +755,84 @@ class DeltasolApi:
                 _LOGGER.error(error)
                 raise IntegrationError(error)
 
-        except RequestException as e:
+        except ClientError as e:
             error = f"Error detecting Resol product - {e}, please file an issue at: https://github.com/dm82m/hass-Deltasol-KM2/issues/new/choose"
             _LOGGER.error(error)
             raise IntegrationError(error)
 
         return self.product
 
-    def fetch_data(self) -> dict[str, DeltasolEndpoint] | None:
+    async def fetch_data(self) -> DeltasolData:
         """Use api to get data"""
 
-        product = self.detect_product()
+        with self.timings.measure("total"):
+            product = await self.detect_product()
 
-        response = {}
-        if product == "km2" or product == "dl2plus":
-            response = self.fetch_data_km2()
-        elif product == "dl2" or product == "dl3":
-            response = self.fetch_data_dlx()
-        else:
-            error = f"We detected your Resol product as {product} and this product is currently not supported. If you want you can file an issue to support this device here: https://github.com/dm82m/hass-Deltasol-KM2/issues/new/choose"
-            _LOGGER.error(error)
-            raise IntegrationError(error)
+            if product == "km2" or product == "dl2plus":
+                return await self.fetch_data_km2()
+            elif product == "dl2" or product == "dl3":
+                return await self.fetch_data_dlx()
+            else:
+                error = f"We detected your Resol product as {product} and this product is currently not supported. If you want you can file an issue to support this device here: https://github.com/dm82m/hass-Deltasol-KM2/issues/new/choose"
+                _LOGGER.error(error)
+                raise IntegrationError(error)
 
-        return self.__parse_data(response)
+    @asynccontextmanager
+    async def __timed_request(self, request):
+        """Enter a request, timing it until its response headers are received."""
+        started = time.perf_counter()
+        try:
+            async with request as resp:
+                self.timings.record("request", time.perf_counter() - started)
+                started = None
+                yield resp
+        except BaseException:
+            if started is not None:
+                # Failed before a response was received
+                self.timings.fail("request")
+            raise
+
+    def __km2_post(self, url, method, params, **kwargs):
+        headers = {"Content-Type": "application/json", **ACCEPT_ENCODING}
+        payload = (
+            "[{'id': '1','jsonrpc': '2.0','method': '"
+            + method
+            + "','params': {"
+            + ",".join(f"'{key}': '{value}'" for key, value in params.items())
+            + "}}]"
+        )
+        return self.session.post(url, headers=headers, data=payload, **kwargs)
+
+    async def __km2_call(self, url, method, params):
+        async with self.__km2_post(url, method, params) as resp:
+            body = await resp.read()
+        return json.loads(body)[0]
+
+    async def __km2_login(self, url):
+        with self.timings.measure("login"):
+            response = await self.__km2_call(
+                url, "login", {"username": self.username, "password": self.password}
+            )
+            self.auth_id = response["result"]["authId"]
+        self.auth_time = time.monotonic()
+        self.login_count += 1
+        _LOGGER.debug(f"KM2 logged in, {self.login_count} login(s) so far")
+
+    async def __km2_current_data(self, url) -> DeltasolData | None:
+        async with self.__timed_request(
+            self.__km2_post(
+                url,
+                "dataGetCurrentData",
+                {"authId": self.auth_id},
+                auto_decompress=False,
+            )
+        ) as resp:
+            # JSON-RPC replies are a list of one response object
+            return await self.__read_data(resp, "km2", "item.result")
 
-    def fetch_data_km2(self):
+    async def fetch_data_km2(self) -> DeltasolData:
         _LOGGER.debug("Retrieving data from km2")
 
-        response = {}
-
         url = f"http://{self.host}:{self.port}/cgi-bin/resol-webservice"
         _LOGGER.debug(f"KM2 requesting sensor data url {url}")
 
@@ -145,64 +840,177 @@ class DeltasolApi:
             if not self.username or not self.password:
                 raise KeyError()
 
-            headers = {"Content-Type": "application/json"}
-
-            payload = (
-                "[{'id': '1','jsonrpc': '2.0','method': 'login','params': {'username': '"
-                + self.username
-                + "','password': '"
-                + self.password
-                + "'}}]"
+            reused = (
+                self.auth_id is not None
+                and time.monotonic() - self.auth_time < KM2_SESSION_MAX_AGE
             )
-            response = requests.request(
-                "POST", url, headers=headers, data=payload
-            ).json()
-            authId = response[0]["result"]["authId"]
-
-            payload = (
-                "[{'id': '1','jsonrpc': '2.0','method': 'dataGetCurrentData','params': {'authId': '"
-                + authId
-                + "'}}]"
-            )
-            response = requests.request(
-                "POST", url, headers=headers, data=payload
-            ).json()
-            _LOGGER.debug(f"KM2 response: {response}")
-            response = response[0]["result"]
+            if not reused:
+                await self.__km2_login(url)
+
+            data = await self.__km2_current_data(url)
+            if data is None and reused:
+                # The KM2 has dropped our session, log in again and retry once.
+                _LOGGER.debug("KM2 rejected session")
+                await self.__km2_login(url)
+                data = await self.__km2_current_data(url)
+            elif reused:
+                self.session_reuse_count += 1
+
+            if data is None:
+                raise KeyError()
 
-        except KeyError:
+        except (KeyError, JsonStreamError):
+            self.auth_id = None
             error = "Please re-check your username and password in your configuration!"
             _LOGGER.error(error)
             raise IntegrationError(error)
 
-        return response
+        return data
+
+    async def fetch_data_dlx(self) -> DeltasolData:
+        filters = self.filters
+        if len(filters) > 1:
+            return await self.__fetch_data_filters(filters)
 
-    def fetch_data_dlx(self):
         _LOGGER.debug("Retrieving data from dlx")
 
-        response = {}
-
         url = f"http://{self.host}:{self.port}/dlx/download/live"
-        debugMessage = f"DLX requesting sensor data url {url}"
 
         if self.username is not None and self.password is not None:
             auth = f"?sessionAuthUsername={self.username}&sessionAuthPassword={self.password}"
-            filter = f"&filter={self.api_key}" if self.api_key else ""
+            filter = f"&filter={filters[0]}" if filters else ""
             url = f"{url}{auth}{filter}"
-            debugMessage = (
-                f"DLX requesting sensor data url {url.replace(self.password, '***')}"
-            )
 
-        _LOGGER.debug(debugMessage)
+        if _LOGGER.isEnabledFor(logging.DEBUG):
+            shown = url.replace(self.password, "***") if self.password else url
+            _LOGGER.debug(f"DLX requesting sensor data url {shown}")
 
-        response = requests.request("GET", url)
+        async with self.__timed_request(
+            self.session.get(url, headers=ACCEPT_ENCODING, auto_decompress=False)
+        ) as resp:
+            if resp.status != 200:
+                error = (
+                    "Please re-check your username and password in your configuration!"
+                )
+                _LOGGER.error(error)
+                raise IntegrationError(error)
+            try:
+                data = await self.__read_data(
+                    resp, f"dlx:{filters[0]}" if filters else "dlx"
+                )
+            except (KeyError, IndexError, TypeError, JsonStreamError) as e:
+                error = f"Invalid response of your DL2/DL3 - {e!r}"
+                _LOGGER.error(error)
+                raise IntegrationError(error)
 
-        if response.status_code == 200:
-            response = response.json()
-        else:
-            error = "Please re-check your username and password in your configuration!"
+        if data is None:
+            error = "Your DL2/DL3 did not report any data"
             _LOGGER.error(error)
             raise IntegrationError(error)
 
-        _LOGGER.debug(f"DLX response: {response}")
-        return response
+        _LOGGER.debug(f"DLX data with {len(data)} fields")
+        return data
+
+    async def fetch_filters(self, filters: list[str | None]) -> list[DeltasolData]:
+        """Fetch the data of several filters of a DL2/DL3, None is unfiltered.
+
+        Returns the data of every filter, in the given order, without merging.
+        """
+        with self.timings.measure("total"):
+            await self.detect_product()
+            return await self.__fetch_filter_parts(filters)
+
+    async def __fetch_data_filters(self, filters: list[str]) -> DeltasolData:
+        """Fetch every filter concurrently and merge their fields."""
+        self.data = self._projection.project(await self.__fetch_filter_parts(filters))
+        _LOGGER.debug(
+            f"DLX data with {len(self.data)} fields of {len(filters)} filters"
+        )
+        return self.data
+
+    async def __fetch_filter_parts(
+        self, filters: list[str | None]
+    ) -> list[DeltasolData]:
+        """Fetch every filter concurrently, each by its own api."""
+        if [api.api_key for api in self._filter_apis] != filters:
+            self._filter_apis = [
+                DeltasolApi(
+                    self.session,
+                    self.host,
+                    self.port,
+                    self.username,
+                    self.password,
+                    api_filter,
+                    self.selection,
+                )
+                for api_filter in filters
+            ]
+        semaphore = asyncio.Semaphore(DLX_FILTER_PARALLELISM)
+
+        async def fetch(api: DeltasolApi) -> DeltasolData:
+            api.product = self.product
+            api.product_details = self.product_details
+            api.timings = self.timings
+            api.capture = self.capture
+            async with semaphore:
+                return await api.fetch_data_dlx()
+
+        counters = ("bytes_received", "bytes_transferred", "short_circuited_polls")
+        before = [
+            sum(getattr(api, counter) for api in self._filter_apis)
+            for counter in counters
+        ]
+        parts = await asyncio.gather(*(fetch(api) for api in self._filter_apis))
+        for counter, total in zip(counters, before):
+            after = sum(getattr(api, counter) for api in self._filter_apis)
+            setattr(self, counter, getattr(self, counter) + after - total)
+        self.payload_bytes = sum(api.payload_bytes for api in self._filter_apis)
+        self.device_timestamp = self._filter_apis[0].device_timestamp
+        return parts
+
+    async def stream_log(
+        self,
+        start: datetime.datetime,
+        end: datetime.datetime,
+        api_filter: str | None = None,
+    ):
+        """Stream the DL2/DL3 log between start and end, optionally filtered.
+
+        Yields ("headers.item", header) and ("headersets.item", headerset)
+        events as they are received, without holding the whole download in
+        memory.
+        """
+        url = f"http://{self.host}:{self.port}/dlx/download/download"
+        params = {
+            "source": "log",
+            "inputType": "packets",
+            "outputType": "json",
+            "sieveInterval": str(BACKFILL_SIEVE_INTERVAL),
+            "startDate": start.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "endDate": end.strftime("%Y-%m-%dT%H:%M:%SZ"),
+        }
+        if self.username is not None and self.password is not None:
+            params["sessionAuthUsername"] = self.username
+            params["sessionAuthPassword"] = self.password
+        if api_filter:
+            params["filter"] = api_filter
+        _LOGGER.debug(f"DLX requesting log from {start} to {end}")
+
+        stream = JsonStream(descend={"headers", "headersets"})
+        async with self.session.get(
+            url, params=params, headers=ACCEPT_ENCODING
+        ) as resp:
+            if resp.status != 200:
+                error = f"Could not download the log, status {resp.status}"
+                _LOGGER.error(error)
+                raise IntegrationError(error)
+            try:
+                async for chunk in resp.content.iter_chunked(STREAM_CHUNK_SIZE):
+                    for event in stream.feed(chunk):
+                        yield event
+                for event in stream.close():
+                    yield event
+            except JsonStreamError as e:
+                error = f"Invalid log download - {e}"
+                _LOGGER.error(error)
+                raise IntegrationError(error)
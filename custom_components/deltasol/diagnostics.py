@@ -0,0 +1,73 @@
+"""Diagnostics support for Resol KM1/KM2, DL2/DL2Plus/DL3, VBus/LAN, VBus/USB."""
+
+import json
+
+from homeassistant.components.diagnostics import async_redact_data
+from homeassistant.const import CONF_HOST, CONF_PASSWORD, CONF_USERNAME
+from homeassistant.core import HomeAssistant
+
+from . import DeltasolConfigEntry
+from .timing import PHASES
+
+TO_REDACT = {CONF_HOST, CONF_PASSWORD, CONF_USERNAME, "serial"}
+# Keys of the raw responses holding credentials, sessions or identifiers
+TO_REDACT_RESPONSE = TO_REDACT | {
+    "authId",
+    "sessionAuthUsername",
+    "sessionAuthPassword",
+}
+
+
+def redact_response(response: dict) -> dict:
+    """Return a captured response with its body redacted."""
+    body = response["body"]
+    if body is None:
+        return response
+    try:
+        body = json.dumps(async_redact_data(json.loads(body), TO_REDACT_RESPONSE))
+    except ValueError:
+        # Dropped rather than included unredacted
+        body = None
+    return {**response, "body": body}
+
+
+async def async_get_config_entry_diagnostics(
+    hass: HomeAssistant, config_entry: DeltasolConfigEntry
+) -> dict:
+    """Return diagnostics for a config entry."""
+    coordinator = config_entry.runtime_data.coordinator
+    api = coordinator.api
+    timings = api.timings
+    return {
+        "config_entry": async_redact_data(dict(config_entry.data), TO_REDACT),
+        "product": api.product,
+        "product_details": async_redact_data(api.product_details or {}, TO_REDACT),
+        "counters": {
+            "bytes_received": api.bytes_received,
+            "bytes_transferred": api.bytes_transferred,
+            "payload_bytes": api.payload_bytes,
+            "short_circuited_polls": api.short_circuited_polls,
+            "login_count": api.login_count,
+            "session_reuse_count": api.session_reuse_count,
+            "entity_updates": coordinator.entity_updates,
+            "skipped_updates": coordinator.skipped_updates,
+        },
+        "timings_ms": {
+            phase: {
+                "samples": len(timings.durations[phase]),
+                "failures": timings.failures[phase],
+                **{
+                    f"p{percent}": None
+                    if (seconds := timings.percentile(phase, percent)) is None
+                    else round(seconds * 1000, 2)
+                    for percent in (50, 95, 100)
+                },
+            }
+            for phase in PHASES
+        },
+        "data": None
+        if coordinator.data is None
+        else async_redact_data(coordinator.data.as_dict(), TO_REDACT),
+        # Raw live responses, to be replayed with scripts/replay_diagnostics.py
+        "responses": [redact_response(response) for response in api.capture.as_list()],
+    }
@@ -0,0 +1,70 @@
+"""
+Discovers Resol devices and json-live-data-servers in the local network.
+Author: dm82m
+https://github.com/dm82m/hass-Deltasol-KM2
+
+Every address and port is probed for the device information a KM2,
+DL2/DL3 or json-live-data-server serves. Probes run concurrently, at most
+DISCOVERY_PARALLELISM at a time and each limited to DISCOVERY_TIMEOUT
+seconds, so a /24 subnet is searched within seconds.
+"""
+
+import asyncio
+import ipaddress
+import logging
+from collections.abc import Iterable
+
+from aiohttp import ClientError, ClientSession
+
+from .const import DISCOVERY_PARALLELISM, DISCOVERY_TIMEOUT
+from .deltasolapi import DEVICE_INFORMATION_PATH, DeltasolApi
+
+_LOGGER = logging.getLogger(__name__)
+
+
+async def async_probe(
+    session: ClientSession, host: str, port: int
+) -> DeltasolApi | None:
+    """Return an api with detected product if a device answers, else None.
+
+    Unlike DeltasolApi.detect_product unreachable addresses are expected
+    here and not logged as errors.
+    """
+    try:
+        async with asyncio.timeout(DISCOVERY_TIMEOUT):
+            async with session.get(
+                f"http://{host}:{port}{DEVICE_INFORMATION_PATH}"
+            ) as response:
+                if response.status != 200:
+                    return None
+                text = await response.text()
+        detected = DeltasolApi.parse_device_information(text)
+    except (ClientError, TimeoutError, OSError, UnicodeDecodeError, AttributeError):
+        return None
+    if detected is None:
+        return None
+
+    api = DeltasolApi(session, host, port)
+    api.product, api.product_details = detected
+    _LOGGER.debug(f"Discovered {api.product} at {host}:{port}")
+    return api
+
+
+async def async_discover(
+    session: ClientSession, hosts: Iterable, ports: Iterable[int]
+) -> list[DeltasolApi]:
+    """Probe every port of every host and return the apis of the devices found."""
+    semaphore = asyncio.Semaphore(DISCOVERY_PARALLELISM)
+
+    async def probe(host, port) -> DeltasolApi | None:
+        async with semaphore:
+            return await async_probe(session, str(host), port)
+
+    ports = list(ports)
+    results = await asyncio.gather(
+        *(probe(host, port) for host in hosts for port in ports)
+    )
+    found = [api for api in results if api is not None]
+    found.sort(key=lambda api: (ipaddress.ip_address(api.host), api.port))
+    _LOGGER.info(f"Discovered {len(found)} Resol device(s)")
+    return found
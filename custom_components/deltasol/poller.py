@@ -0,0 +1,195 @@
+"""
+Shares polls of one device between config entries.
+Author: dm82m
+https://github.com/dm82m/hass-Deltasol-KM2
+
+Config entries of the same host, port and credentials share one
+DeltasolPoller. It owns the only DeltasolApi of these entries, so they log
+in once, and runs one fetch per cycle of every DL2/DL3 filter the entries
+request, parsing the fields chosen by any of their field selections. The
+result is handed to every entry's coordinator, which picks its filters and
+applies its own field selection.
+"""
+
+import asyncio
+import logging
+import math
+import time
+from collections.abc import Mapping
+
+from homeassistant.const import (
+    CONF_HOST,
+    CONF_PASSWORD,
+    CONF_PORT,
+    CONF_USERNAME,
+)
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.aiohttp_client import async_get_clientsession
+
+from .const import DEFAULT_TIMEOUT, DOMAIN, SHARED_POLL_MAX_AGE
+from .deltasolapi import DeltasolApi, DeltasolData, DeltasolSelection
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class DeltasolPoller:
+    """Fetches the data of one device once for all subscribed coordinators.
+
+    Coordinators polling while a fetch is running, or shortly after one has
+    finished, get its result instead of fetching again. Every other
+    subscribed coordinator is pushed the result of a refresh, which also
+    postpones its own next poll. Results are the data per DL2/DL3 filter,
+    None is the unfiltered data and the only one of other products.
+    """
+
+    def __init__(self, hass: HomeAssistant, key: tuple, api: DeltasolApi) -> None:
+        """Initialise poller."""
+        self.hass = hass
+        self.key = key
+        self.api = api
+        self.coordinators: list = []
+        self._fetch: asyncio.Task[dict[str | None, DeltasolData]] | None = None
+        # Coordinators awaiting the running fetch, they are not pushed its result
+        self._waiting: set = set()
+        self._fetched_at = 0.0
+        # Local time the last fetch was sent at
+        self.sent = 0.0
+        # Data of the last fetch per filter, and the fields it was parsed for
+        self.data: dict[str | None, DeltasolData] = {}
+        self._selection = DeltasolSelection()
+        self.fetch_count = 0
+        self.shared_count = 0
+
+    @callback
+    def async_add(self, coordinator) -> None:
+        """Subscribe a coordinator to the results of this poller."""
+        if coordinator not in self.coordinators:
+            self.coordinators.append(coordinator)
+
+    @callback
+    def async_remove(self, coordinator) -> None:
+        """Unsubscribe a coordinator, dropping the poller after the last one."""
+        if coordinator in self.coordinators:
+            self.coordinators.remove(coordinator)
+        pollers = self.hass.data.get(DOMAIN, {})
+        if not self.coordinators and pollers.get(self.key) is self:
+            del pollers[self.key]
+
+    def __filters(self, coordinator) -> list[str | None]:
+        """Return the filters of the subscribed coordinators and the given one."""
+        return list(
+            dict.fromkeys(
+                api_filter
+                for other in (*self.coordinators, coordinator)
+                for api_filter in other.filters or [None]
+            )
+        )
+
+    def __selection(self, coordinator):
+        """Return the fields of the subscribed coordinators and the given one."""
+        return DeltasolSelection.union(
+            other.selection for other in (*self.coordinators, coordinator)
+        )
+
+    def __covers(self, data: dict, coordinator) -> bool:
+        """Return whether data holds the filters and fields of a coordinator."""
+        return all(
+            api_filter in data for api_filter in coordinator.filters or [None]
+        ) and (
+            DeltasolSelection.union((self._selection, coordinator.selection))
+            == self._selection
+        )
+
+    async def async_fetch(
+        self, coordinator, sample: bool = False
+    ) -> dict[str | None, DeltasolData]:
+        """Return the current data of the device, fetched once per cycle.
+
+        The results of samples are not pushed to the other coordinators, they
+        would publish faster than their scan interval.
+        """
+        # A sampling coordinator must not get the result of its previous
+        # sample, which finished less than one sample interval ago
+        max_age = min(SHARED_POLL_MAX_AGE, coordinator.sample_interval / 2 or math.inf)
+        if (
+            self.__covers(self.data, coordinator)
+            and time.monotonic() - self._fetched_at < max_age
+        ):
+            # Just fetched for another config entry
+            self.shared_count += 1
+            return self.data
+
+        while True:
+            if self._fetch is None:
+                self._fetch = self.hass.async_create_task(
+                    self.__async_fetch(coordinator, sample), "deltasol shared poll"
+                )
+            else:
+                self.shared_count += 1
+            self._waiting.add(coordinator)
+            # A timed out coordinator must not cancel the fetch of the others
+            data = await asyncio.shield(self._fetch)
+            if self.__covers(data, coordinator):
+                return data
+            # Started before the coordinator requested its filters or fields
+
+    async def __async_fetch(
+        self, coordinator, sample: bool
+    ) -> dict[str | None, DeltasolData]:
+        filters = self.__filters(coordinator)
+        # Narrowed again once a coordinator has unsubscribed
+        selection = self.__selection(coordinator)
+        self.api.select(selection)
+        self.sent = time.time()
+        try:
+            async with asyncio.timeout(DEFAULT_TIMEOUT):
+                product = await self.api.detect_product()
+                if product in ("dl2", "dl3") and filters != [None]:
+                    # Every filter at once, each by its own request
+                    parts = await self.api.fetch_filters(filters)
+                else:
+                    parts = [await self.api.fetch_data()] * len(filters)
+        finally:
+            self._fetch = None
+            waiting, self._waiting = self._waiting, set()
+
+        self.data = dict(zip(filters, parts))
+        self._selection = selection
+        self._fetched_at = time.monotonic()
+        self.fetch_count += 1
+        if not sample:
+            for other in self.coordinators:
+                if other is not coordinator and other not in waiting:
+                    other.async_set_polled_data(self.data)
+        _LOGGER.debug(
+            f"Polled {len(filters)} filter(s) of {self.api.host}:{self.api.port} for "
+            f"{len(self.coordinators)} config entries, {self.fetch_count} fetch(es) "
+            f"shared {self.shared_count} time(s)"
+        )
+        return self.data
+
+
+@callback
+def async_get_poller(hass: HomeAssistant, config: Mapping) -> DeltasolPoller:
+    """Return the poller of the device a config entry polls."""
+    key = (
+        config.get(CONF_HOST),
+        config.get(CONF_PORT),
+        config.get(CONF_USERNAME),
+        config.get(CONF_PASSWORD),
+    )
+    pollers: dict[tuple, DeltasolPoller] = hass.data.setdefault(DOMAIN, {})
+    poller = pollers.get(key)
+    if poller is None:
+        poller = pollers[key] = DeltasolPoller(
+            hass,
+            key,
+            DeltasolApi(
+                session=async_get_clientsession(hass),
+                host=config.get(CONF_HOST),
+                port=config.get(CONF_PORT),
+                username=config.get(CONF_USERNAME),
+                password=config.get(CONF_PASSWORD),
+            ),
+        )
+    return poller
@@ -0,0 +1,229 @@
+"""Adaptive poll scheduling for Resol KM1/KM2, DL2/DL2Plus/DL3, VBus/LAN, VBus/USB."""
+
+import logging
+import math
+from datetime import timedelta
+
+from .const import (
+    ADAPTIVE_FLAT_SCORE,
+    ADAPTIVE_LENGTHEN_FACTOR,
+    ADAPTIVE_MAX_FACTOR,
+    ADAPTIVE_SHORTEN_FACTOR,
+    ADAPTIVE_VOLATILITY_RATES,
+    ALIGN_MARGIN,
+    ALIGN_MIN_PERIOD,
+    ALIGN_TOLERANCE,
+    BACKOFF_MAX_INTERVAL,
+)
+from .deltasolapi import DeltasolData
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class AdaptiveScheduler:
+    """Derives the next poll interval from value volatility and errors.
+
+    The interval is shortened down to min_interval while temperatures, flow
+    rates, pump speeds or power change fast, lengthened up to a multiple of the
+    configured interval while they stay flat and backed off exponentially while
+    the device is unreachable.
+    """
+
+    def __init__(self, min_interval: int, base_interval: int) -> None:
+        """Initialise scheduler."""
+        self.min_interval = min_interval
+        self.base_interval = base_interval
+        self.max_interval = base_interval * ADAPTIVE_MAX_FACTOR
+        self.interval = float(base_interval)
+        self.failures = 0
+
+    def volatility(self, old: DeltasolData | None, new: DeltasolData) -> float | None:
+        """Return the fastest relative change rate between two polls.
+
+        1.0 means one field changed exactly at its reference rate per minute,
+        None means the polls can not be compared.
+        """
+        if old is None or old is new or old.layout is not new.layout:
+            return None
+
+        minutes = self.interval / 60
+        score = 0.0
+        for field, old_value, new_value in zip(
+            new.layout.fields, old.values, new.values
+        ):
+            rate = ADAPTIVE_VOLATILITY_RATES.get(field.unit)
+            if (
+                rate is None
+                or not isinstance(old_value, (int, float))
+                or not isinstance(new_value, (int, float))
+            ):
+                continue
+            score = max(score, abs(new_value - old_value) / minutes / rate)
+        return score
+
+    def on_success(self, old: DeltasolData | None, new: DeltasolData) -> timedelta:
+        """Return the next poll interval after a successful poll."""
+        self.reset()
+        score = self.volatility(old, new)
+        if score is not None:
+            if score >= 1:
+                self.interval *= ADAPTIVE_SHORTEN_FACTOR
+            elif score < ADAPTIVE_FLAT_SCORE:
+                self.interval *= ADAPTIVE_LENGTHEN_FACTOR
+            self.interval = min(
+                max(self.interval, self.min_interval), self.max_interval
+            )
+
+        _LOGGER.debug(
+            "Adaptive polling: volatility %s, next poll in %.0f s", score, self.interval
+        )
+        return timedelta(seconds=self.interval)
+
+    def reset(self) -> timedelta:
+        """Restart from the configured interval once the device is back."""
+        if self.failures:
+            self.failures = 0
+            self.interval = float(self.base_interval)
+        return timedelta(seconds=self.interval)
+
+    def on_failure(self) -> timedelta:
+        """Return the next poll interval after a failed poll."""
+        self.failures += 1
+        interval = min(
+            self.base_interval * 2 ** min(self.failures, 16), BACKOFF_MAX_INTERVAL
+        )
+        _LOGGER.debug(
+            "Adaptive polling: %s failed poll(s), next poll in %s s",
+            self.failures,
+            interval,
+        )
+        return timedelta(seconds=interval)
+
+
+class DeviceClockAligner:
+    """Aligns polls to the device's own data refresh cadence.
+
+    The headerset timestamps reported by the device tell when it last
+    refreshed its data. The refresh period is the common divisor of the
+    intervals between the distinct timestamps of the polls, a multiple of
+    the true period if the polls are further apart.
+
+    The phase follows from the send time of the polls. The data of a poll
+    was refreshed before it was sent and the following refresh had not yet
+    happened, so the clock offset lies between the largest send time minus
+    device timestamp minus the period and the smallest one. While that range
+    is wider than ALIGN_MARGIN, polls probe its middle to narrow it down,
+    then they are placed just after the expected refresh.
+    """
+
+    def __init__(self) -> None:
+        """Initialise aligner."""
+        self.timestamp: float | None = None
+        self.period: float | None = None
+        # Smallest and largest send time minus device timestamp
+        self._earliest: float | None = None
+        self._latest: float | None = None
+
+    @property
+    def offset(self) -> tuple[float, float] | None:
+        """Return the range of the device clock offset, None if unknown."""
+        if self._earliest is None or self.period is None:
+            return None
+        return self._latest - self.period, self._earliest
+
+    @staticmethod
+    def common_period(intervals) -> float | None:
+        """Return the largest period every interval is a multiple of.
+
+        Returns None if it is shorter than ALIGN_MIN_PERIOD.
+        """
+        period = None
+        for interval in intervals:
+            if period is None:
+                period = interval
+                continue
+            a, b = max(period, interval), min(period, interval)
+            # Euclid's algorithm, remainders within the tolerance are none
+            while b >= ALIGN_MIN_PERIOD:
+                remainder = a % b
+                if remainder <= ALIGN_TOLERANCE or b - remainder <= ALIGN_TOLERANCE:
+                    break
+                a, b = b, remainder
+            if b < ALIGN_MIN_PERIOD:
+                return None
+            period = b
+        if period is None or period < ALIGN_MIN_PERIOD:
+            return None
+        return period
+
+    def observe(self, timestamp, sent: float) -> None:
+        """Record the device timestamp of a poll sent at local time."""
+        if not isinstance(timestamp, (int, float)):
+            return
+        if timestamp > 1e11:
+            # Milliseconds since the epoch
+            timestamp /= 1000
+
+        if self.timestamp is not None and timestamp < self.timestamp:
+            # The device clock was set back, earlier estimates do not apply
+            self.period = None
+            self._earliest = None
+        elif self.timestamp is not None and timestamp > self.timestamp:
+            interval = timestamp - self.timestamp
+            # Restarts from this interval if it is no multiple of the period
+            self.period = self.common_period(
+                (self.period, interval) if self.period else (interval,)
+            ) or self.common_period((interval,))
+        self.timestamp = timestamp
+
+        age = sent - timestamp
+        if self._earliest is None:
+            self._earliest = self._latest = age
+            return
+        self._earliest = min(self._earliest, age)
+        self._latest = max(self._latest, age)
+        offset = self.offset
+        if offset is not None and offset[0] >= offset[1]:
+            # The clocks have drifted apart, estimate the phase again
+            self._earliest = self._latest = age
+
+    def delay(self, interval: float, min_interval: float, now: float) -> float:
+        """Return the delay of the next poll aligned to device refreshes.
+
+        The poll is placed on the last expected refresh before interval, or
+        moved to the following one if that is closer than min_interval, as
+        long as it is at most min_interval late. A probe that can not be
+        placed falls back to the expected refresh, anything else to interval.
+        """
+        offset = self.offset
+        if self.timestamp is None or offset is None:
+            return interval
+
+        lowest, highest = offset
+        targets = [highest + ALIGN_MARGIN]
+        if highest - lowest > ALIGN_MARGIN:
+            # Probe the middle of the possible offsets, narrowing them down
+            targets.insert(0, (lowest + highest) / 2)
+        for target in targets:
+            refreshed = self.timestamp + target
+            # Last expected device refresh before the regular poll time
+            aligned = refreshed + self.period * math.floor(
+                (now + interval - refreshed) / self.period
+            )
+            if aligned < now + min_interval:
+                aligned += self.period * math.ceil(
+                    (now + min_interval - aligned) / self.period
+                )
+            if aligned <= now + interval + min_interval:
+                break
+        else:
+            return interval
+        _LOGGER.debug(
+            "Device refreshes every %.0f s, clock offset %.0f to %.0f s, "
+            "aligning next poll to %.0f s",
+            self.period,
+            lowest,
+            highest,
+            aligned - now,
+        )
+        return aligned - now
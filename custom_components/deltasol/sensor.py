@@ -2,9 +2,8 @@
 
 import logging
 from collections import defaultdict
-from collections.abc import Mapping
-from datetime import date
-from typing import Any, ClassVar
+from datetime import datetime
+from typing import ClassVar
 
 from homeassistant.components.sensor import (
     SensorDeviceClass,
@@ -12,17 +11,24 @@ from homeassistant.components.sensor import (
     SensorStateClass,
 )
 from homeassistant.config_entries import SOURCE_IMPORT
-from homeassistant.const import PERCENTAGE, UnitOfEnergy, UnitOfPower, UnitOfTemperature
+from homeassistant.const import (
+    PERCENTAGE,
+    UnitOfEnergy,
+    UnitOfInformation,
+    UnitOfPower,
+    UnitOfTemperature,
+    UnitOfTime,
+)
 from homeassistant.core import HomeAssistant, callback
 from homeassistant.helpers.device_registry import DeviceInfo
 from homeassistant.helpers.entity import EntityCategory
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 from homeassistant.helpers.update_coordinator import CoordinatorEntity
-from homeassistant.util import dt as dt_util
 
 from . import DeltasolConfigEntry, DeltasolCoordinator
 from .const import DOMAIN
-from .deltasolapi import DeltasolEndpoint
+from .deltasolapi import DeltasolField
+from .timing import PHASES
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -65,14 +71,44 @@ async def async_setup_entry(
     """Set up the Sensors."""
     coordinator = config.runtime_data.coordinator
     async_add_entities(
-        DeltasolSensor(coordinator, unique_id, endpoint)
-        for unique_id, endpoint in coordinator.data.items()
+        DeltasolSensor(coordinator, config.entry_id, field)
+        for field in coordinator.data.layout.fields
+    )
+    # Diagnostics are per config entry, several may share one device
+    async_add_entities([DeltasolLastPollSensor(coordinator, config.entry_id)])
+    if coordinator.poller is not None:
+        # Only polled devices have phase timings
+        async_add_entities(
+            [
+                DeltasolPollLatencySensor(coordinator, config.entry_id, 50),
+                DeltasolPollLatencySensor(coordinator, config.entry_id, 95),
+                DeltasolPollFailuresSensor(coordinator, config.entry_id),
+                DeltasolPayloadSizeSensor(coordinator, config.entry_id),
+            ]
+        )
+
+
+def device_info(product_details: dict) -> DeviceInfo:
+    """Return the device info of the Resol device itself."""
+    # Device unique identifier is the serial of the Resol device itself
+    return DeviceInfo(
+        identifiers={(DOMAIN, product_details["serial"])},
+        name=product_details["name"],
+        manufacturer=product_details["vendor"],
+        model=product_details["name"],
+        sw_version=product_details["version"],
+        serial_number=product_details["serial"],
+        hw_version=product_details["build"],
+        model_id=product_details["features"],
     )
 
 
 class DeltasolSensor(CoordinatorEntity, SensorEntity):
     """Representation of a Resol sensor."""
 
+    # Sample statistics change with every publish, the recorder keeps the value
+    _unrecorded_attributes = frozenset({"min", "max", "samples"})
+
     icon_mapper: ClassVar[defaultdict[str, str]] = defaultdict(
         lambda: "mdi:alert-circle",
         {
@@ -90,28 +126,33 @@ class DeltasolSensor(CoordinatorEntity, SensorEntity):
     def __init__(
         self,
         coordinator: DeltasolCoordinator,
-        unique_id: str,
-        endpoint: DeltasolEndpoint,
+        entry_id: str,
+        field: DeltasolField,
     ) -> None:
         """Initialize the sensor."""
-        super().__init__(coordinator)
+        # Use the unique_id as listener context, so the coordinator only
+        # notifies this sensor when its value has changed
+        super().__init__(coordinator, context=field.unique_id)
 
         # Set correct type for coordinator
         self.coordinator: DeltasolCoordinator = coordinator
 
-        self._attr_unique_id = unique_id
-        self._endpoint = endpoint
+        self._field = field
+        # Slot of this sensor within the values of coordinator.data, resolved
+        # again whenever the device reports a different header layout
+        self._layout = coordinator.data.layout
+        self._slot = field.slot
 
-        self._last_updated = dt_util.now()
-        self._attr_unique_id = unique_id
-        self._attr_name = endpoint.name
-        self._attr_icon = DeltasolSensor.icon_mapper[endpoint.unit]
+        # Several config entries may poll the same field of one device
+        self._attr_unique_id = entry_id + "__" + field.unique_id
+        self._attr_name = field.name
+        self._attr_icon = DeltasolSensor.icon_mapper[field.unit]
 
-        self._unit = endpoint.unit
+        self._unit = field.unit
         self._state = None
 
         # Set entity category to diagnostic and disabled for sensors with no unit
-        if not endpoint.unit:
+        if not field.unit:
             self._attr_entity_category = EntityCategory.DIAGNOSTIC
             self._attr_entity_registry_enabled_default = False
 
@@ -123,28 +164,40 @@ class DeltasolSensor(CoordinatorEntity, SensorEntity):
     @callback
     def _handle_coordinator_update(self) -> None:
         """Handle updated data from the coordinator."""
-        self._last_updated = dt_util.now()
         _LOGGER.debug("Updating %s", self.name)
         self.async_write_ha_state()
 
     @property
     def native_value(self):
         """Return the value reported by the sensor."""
-        try:
-            state = self.coordinator.data[self.unique_id].value
-            if state:
-                return state
-        except KeyError:
+        data = self.coordinator.data
+        if data.layout is not self._layout:
+            self._layout = data.layout
+            self._slot = data.layout.slots.get(self._field.unique_id)
+        if self._slot is None:
             _LOGGER.error("Can't find %s", self.name)
-            _LOGGER.debug("Sensor data %s", self.coordinator.data)
+            if _LOGGER.isEnabledFor(logging.DEBUG):
+                _LOGGER.debug("Sensor data %s", dict(data.items()))
             return None
-        else:
-            return 0
+        state = data.values[self._slot]
+        if state:
+            return state
+        return 0
 
     @property
     def native_unit_of_measurement(self) -> str | None:
         """Return the unit of measurement of this entity, if any."""
-        return self._endpoint.unit
+        return self._field.unit
+
+    @property
+    def extra_state_attributes(self) -> dict | None:
+        """Return min, max and sample count if the value is a sampled mean."""
+        aggregator = self.coordinator.aggregator
+        if aggregator is None or self._slot is None:
+            return None
+        if aggregator.published is not self.coordinator.data:
+            return None
+        return aggregator.statistics(self._slot)
 
     @property
     def device_class(self) -> SensorDeviceClass | None:
@@ -157,7 +210,7 @@ class DeltasolSensor(CoordinatorEntity, SensorEntity):
             return SensorDeviceClass.ENERGY
         if self._unit == UnitOfPower.WATT:
             return SensorDeviceClass.POWER
-        if isinstance(self.coordinator.data[self.unique_id].value, date):
+        if self._field.is_date:
             return SensorDeviceClass.DATE
         return None
 
@@ -176,24 +229,141 @@ class DeltasolSensor(CoordinatorEntity, SensorEntity):
     def device_info(self) -> DeviceInfo:
         """Return device specific attributes."""
         # Device unique identifier is the serial + bus_src
-        product_details = self._endpoint.product_details
+        product_details = self.coordinator.data.product_details
         return DeviceInfo(
             identifiers={
-                (DOMAIN, product_details["serial"] + "_" + self._endpoint.bus_src)
+                (DOMAIN, product_details["serial"] + "_" + self._field.bus_src)
             },
-            name=self._endpoint.bus_src,
+            name=self._field.bus_src,
             manufacturer=product_details["vendor"],
             model=product_details["name"],
             sw_version=product_details["version"],
             serial_number=product_details["serial"],
             hw_version=product_details["build"],
             model_id=product_details["features"],
+            via_device=(DOMAIN, product_details["serial"]),
         )
 
+
+class DeltasolLastPollSensor(CoordinatorEntity, SensorEntity):
+    """Timestamp of the last successful poll of a Resol device."""
+
+    _attr_device_class = SensorDeviceClass.TIMESTAMP
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_icon = "mdi:clock-check-outline"
+    _attr_name = "last_successful_poll"
+
+    def __init__(self, coordinator: DeltasolCoordinator, entry_id: str) -> None:
+        """Initialize the sensor."""
+        super().__init__(coordinator)
+
+        # Set correct type for coordinator
+        self.coordinator: DeltasolCoordinator = coordinator
+
+        product_details = coordinator.data.product_details
+        self._attr_unique_id = entry_id + "__last_successful_poll"
+        self._attr_device_info = device_info(product_details)
+
+    @property
+    def native_value(self) -> datetime | None:
+        """Return the time of the last successful poll."""
+        return self.coordinator.last_successful_poll
+
+
+class DeltasolPollDiagnosticSensor(CoordinatorEntity, SensorEntity):
+    """Base of the disabled by default diagnostics of the polls of a device."""
+
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_entity_registry_enabled_default = False
+
+    def __init__(
+        self, coordinator: DeltasolCoordinator, entry_id: str, name: str
+    ) -> None:
+        """Initialize the sensor."""
+        super().__init__(coordinator)
+
+        # Set correct type for coordinator
+        self.coordinator: DeltasolCoordinator = coordinator
+
+        product_details = coordinator.data.product_details
+        self._attr_name = name
+        self._attr_unique_id = entry_id + "__" + name
+        self._attr_device_info = device_info(product_details)
+
+
+class DeltasolPollLatencySensor(DeltasolPollDiagnosticSensor):
+    """Percentile of the duration of recent polls, per phase as attributes."""
+
+    _attr_device_class = SensorDeviceClass.DURATION
+    _attr_state_class = SensorStateClass.MEASUREMENT
+    _attr_native_unit_of_measurement = UnitOfTime.MILLISECONDS
+    _attr_icon = "mdi:timer-outline"
+
+    def __init__(
+        self, coordinator: DeltasolCoordinator, entry_id: str, percentile: int
+    ) -> None:
+        """Initialize the sensor."""
+        super().__init__(coordinator, entry_id, f"poll_latency_p{percentile}")
+        self._percentile = percentile
+
+    def __milliseconds(self, phase: str) -> float | None:
+        seconds = self.coordinator.api.timings.percentile(phase, self._percentile)
+        return None if seconds is None else round(seconds * 1000, 1)
+
+    @property
+    def native_value(self) -> float | None:
+        """Return the percentile of the whole fetch in milliseconds."""
+        return self.__milliseconds("total")
+
+    @property
+    def extra_state_attributes(self) -> dict:
+        """Return the percentile of every phase in milliseconds."""
+        return {phase: self.__milliseconds(phase) for phase in PHASES}
+
+
+class DeltasolPollFailuresSensor(DeltasolPollDiagnosticSensor):
+    """Number of failed polls, per phase as attributes."""
+
+    _attr_state_class = SensorStateClass.TOTAL_INCREASING
+    _attr_icon = "mdi:alert-circle-outline"
+
+    def __init__(self, coordinator: DeltasolCoordinator, entry_id: str) -> None:
+        """Initialize the sensor."""
+        super().__init__(coordinator, entry_id, "poll_failures")
+
+    @property
+    def native_value(self) -> int:
+        """Return the number of failed fetches since Home Assistant started."""
+        return self.coordinator.api.timings.failures["total"]
+
+    @property
+    def extra_state_attributes(self) -> dict:
+        """Return the number of failures of every phase."""
+        return dict(self.coordinator.api.timings.failures)
+
+
+class DeltasolPayloadSizeSensor(DeltasolPollDiagnosticSensor):
+    """Size of the last live response of a device."""
+
+    _attr_device_class = SensorDeviceClass.DATA_SIZE
+    _attr_state_class = SensorStateClass.MEASUREMENT
+    _attr_native_unit_of_measurement = UnitOfInformation.BYTES
+    _attr_icon = "mdi:file-download-outline"
+
+    def __init__(self, coordinator: DeltasolCoordinator, entry_id: str) -> None:
+        """Initialize the sensor."""
+        super().__init__(coordinator, entry_id, "payload_size")
+
+    @property
+    def native_value(self) -> int:
+        """Return the size of the last response after decompression."""
+        return self.coordinator.api.payload_bytes
+
     @property
-    def extra_state_attributes(self) -> Mapping[str, Any] | None:
-        """Return the state attributes of this device."""
-        attr = {}
-        if self._last_updated is not None:
-            attr["Last Updated"] = self._last_updated
-        return attr
+    def extra_state_attributes(self) -> dict:
+        """Return the bytes received and transferred since Home Assistant started."""
+        api = self.coordinator.api
+        return {
+            "bytes_received": api.bytes_received,
+            "bytes_transferred": api.bytes_transferred,
+        }
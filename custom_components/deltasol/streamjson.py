@@ -0,0 +1,161 @@
+"""
+Incremental parsing of large JSON responses of Resol devices.
+Author: dm82m
+https://github.com/dm82m/hass-Deltasol-KM2
+
+JsonStream consumes a body chunk by chunk and emits (path, value) events.
+Paths join object keys and "item" for array items with dots, e.g.
+"headersets.item.packets.item". Only the containers listed as descend paths
+(and the top level container) are walked structurally, everything else is
+decoded as a whole when it is complete. So only one value below a descended
+container has to be held in memory at a time.
+"""
+
+import codecs
+import json
+
+_WHITESPACE = " \t\n\r"
+_DELIMITERS = _WHITESPACE + ",]}"
+
+# Frame states
+_KEY = 0  # before a member key or "}"
+_COLON = 1  # before ":"
+_VALUE = 2  # before a member value or an array item
+_SEPARATOR = 3  # before "," or the closing bracket
+
+# Keep consumed text until it is this long, then drop it at once
+_COMPACT_SIZE = 65536
+
+
+class JsonStreamError(ValueError):
+    """Error to indicate a streamed body is not valid JSON."""
+
+
+class JsonStream:
+    """Incrementally parses a JSON object or array.
+
+    Entering a descended container emits (path, START), leaving it emits
+    (path, END), all other values are emitted as (path, value).
+    """
+
+    START = object()
+    END = object()
+
+    def __init__(self, descend=()) -> None:
+        """Initialise stream."""
+        self.descend = frozenset(descend)
+        self._decoder = json.JSONDecoder()
+        self._text = codecs.getincrementaldecoder("utf-8")()
+        self._buffer = ""
+        self._pos = 0
+        # [is_object, path, state, key] of the open descended containers
+        self._frames: list[list] = []
+        self._started = False
+
+    def feed(self, chunk: bytes) -> list[tuple[str, object]]:
+        """Add a chunk of the body and return the events completed by it."""
+        self._buffer += self._text.decode(chunk)
+        return self.__parse(final=False)
+
+    def close(self) -> list[tuple[str, object]]:
+        """Finish the body and return the remaining events."""
+        self._buffer += self._text.decode(b"", final=True)
+        events = self.__parse(final=True)
+        if not self._started or self._frames:
+            raise JsonStreamError("Incomplete JSON body")
+        return events
+
+    def __skip(self) -> str | None:
+        """Skip whitespace and return the next character, None if none."""
+        buffer = self._buffer
+        pos = self._pos
+        while pos < len(buffer) and buffer[pos] in _WHITESPACE:
+            pos += 1
+        self._pos = pos
+        return buffer[pos] if pos < len(buffer) else None
+
+    def __value(self, final: bool):
+        """Decode the value at the current position, None if incomplete."""
+        try:
+            value, end = self._decoder.raw_decode(self._buffer, self._pos)
+        except json.JSONDecodeError as e:
+            if final:
+                raise JsonStreamError(str(e)) from e
+            return None
+        if not final and (
+            end == len(self._buffer)
+            or (
+                isinstance(value, (int, float)) and self._buffer[end] not in _DELIMITERS
+            )
+        ):
+            # A number could continue in the next chunk
+            return None
+        self._pos = end
+        return (value,)
+
+    def __open(self, char, path, events) -> None:
+        self._pos += 1
+        is_object = char == "{"
+        self._frames.append([is_object, path, _KEY if is_object else _VALUE, None])
+        events.append((path, self.START))
+
+    def __close(self, events) -> None:
+        self._pos += 1
+        _, path, _, _ = self._frames.pop()
+        events.append((path, self.END))
+
+    def __parse(self, final: bool) -> list[tuple[str, object]]:
+        events = []
+        while (char := self.__skip()) is not None:
+            if not self._frames:
+                if self._started or char not in "{[":
+                    raise JsonStreamError(f"Unexpected {char!r} at {self._pos}")
+                self._started = True
+                self.__open(char, "", events)
+                continue
+
+            frame = self._frames[-1]
+            is_object, path, state, key = frame
+            if state == _KEY:
+                if char == "}":
+                    self.__close(events)
+                    continue
+                key = self.__value(final)
+                if key is None:
+                    break
+                if not isinstance(key[0], str):
+                    raise JsonStreamError(f"Expected key at {self._pos}")
+                frame[3] = key[0]
+                frame[2] = _COLON
+            elif state == _COLON:
+                if char != ":":
+                    raise JsonStreamError(f"Expected ':' at {self._pos}")
+                self._pos += 1
+                frame[2] = _VALUE
+            elif state == _VALUE:
+                if not is_object and char == "]":
+                    self.__close(events)
+                    continue
+                child = key if is_object else "item"
+                child = f"{path}.{child}" if path else child
+                frame[2] = _SEPARATOR
+                if char in "{[" and child in self.descend:
+                    self.__open(char, child, events)
+                    continue
+                value = self.__value(final)
+                if value is None:
+                    frame[2] = _VALUE
+                    break
+                events.append((child, value[0]))
+            elif char == ",":
+                self._pos += 1
+                frame[2] = _KEY if is_object else _VALUE
+            elif char == ("}" if is_object else "]"):
+                self.__close(events)
+            else:
+                raise JsonStreamError(f"Unexpected {char!r} at {self._pos}")
+
+        if self._pos >= _COMPACT_SIZE:
+            self._buffer = self._buffer[self._pos :]
+            self._pos = 0
+        return events
@@ -0,0 +1,57 @@
+"""
+Durations and failures of the phases of recent polls.
+Author: dm82m
+https://github.com/dm82m/hass-Deltasol-KM2
+
+A poll is split into detecting the product, the KM2 login, the request until
+the response headers arrive, receiving the body and parsing it, plus the
+whole fetch. Parsing is interleaved with receiving, the time spent waiting
+for the next chunk counts as receiving and the time decoding it as parsing.
+"""
+
+import time
+from collections import deque
+from contextlib import contextmanager
+
+PHASES = ("detect", "login", "request", "receive", "parse", "total")
+
+
+class DeltasolTimings:
+    """Rolling window of the durations of every phase, and its failure counts."""
+
+    def __init__(self, window: int) -> None:
+        """Initialise timings."""
+        self.durations: dict[str, deque[float]] = {
+            phase: deque(maxlen=window) for phase in PHASES
+        }
+        self.failures: dict[str, int] = dict.fromkeys(PHASES, 0)
+        # Duration of the last completed run of every phase
+        self.last: dict[str, float | None] = dict.fromkeys(PHASES)
+
+    def record(self, phase: str, seconds: float) -> None:
+        """Record the duration of a completed phase."""
+        self.durations[phase].append(seconds)
+        self.last[phase] = seconds
+
+    def fail(self, phase: str) -> None:
+        """Count a failed phase."""
+        self.failures[phase] += 1
+
+    @contextmanager
+    def measure(self, phase: str):
+        """Record the duration of the block, or count it failed if it raises."""
+        start = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            # Includes timeouts, which cancel the running phase
+            self.fail(phase)
+            raise
+        self.record(phase, time.perf_counter() - start)
+
+    def percentile(self, phase: str, percent: float) -> float | None:
+        """Return a percentile of the recent durations of a phase in seconds."""
+        durations = sorted(self.durations[phase])
+        if not durations:
+            return None
+        return durations[min(int(len(durations) * percent / 100), len(durations) - 1)]
@@ -0,0 +1,338 @@
+"""
+Native VBus transports for Resol KM1, VBus/LAN and VBus/USB.
+Author: dm82m
+https://github.com/dm82m/hass-Deltasol-KM2
+
+Decodes the VBus protocol in-process and pushes header sets shaped like the
+json-live-data-server output, so entities keep the same unique_ids.
+"""
+
+import asyncio
+import logging
+import os
+import struct
+import termios
+from collections import namedtuple
+from collections.abc import Callable
+
+from homeassistant.exceptions import IntegrationError
+
+from .const import DEFAULT_TIMEOUT, VBUS_COALESCE_DELAY, VBUS_SERIAL_BAUDRATE
+from .vsf import VBusPacketDecoder, VBusSpecification
+
+_LOGGER = logging.getLogger(__name__)
+
+SYNC_BYTE = 0xAA
+PROTOCOL_VERSION_1 = 0x10
+HEADER_LENGTH = 10
+FRAME_LENGTH = 6
+
+VBusPacket = namedtuple("VBusPacket", "channel, destination, source, command, payload")
+
+
+# Bits a septett byte restores in the little endian word of its frame
+SEPTETT_BITS = tuple(
+    sum(0x80 << (8 * index) for index in range(4) if septett & (1 << index))
+    for septett in range(16)
+)
+
+
+def checksum(data) -> int:
+    """Return the VBus protocol version 1 checksum of data."""
+    return (0x7F - sum(data)) & 0x7F
+
+
+class VBusStreamDecoder:
+    """Splits a raw VBus byte stream into packets, resyncing on corruption."""
+
+    def __init__(self, channel=0) -> None:
+        """Initialise decoder."""
+        self.channel = channel
+        self.buffer = bytearray()
+        self.corrupt_frames = 0
+
+    def feed(self, data: bytes) -> list[VBusPacket]:
+        """Add received bytes and return the packets completed by them."""
+        buffer = self.buffer
+        buffer += data
+        packets = []
+
+        while True:
+            start = buffer.find(SYNC_BYTE)
+            if start < 0:
+                buffer.clear()
+                break
+            del buffer[:start]
+            if len(buffer) < HEADER_LENGTH:
+                break
+
+            header = buffer[1:HEADER_LENGTH]
+            if buffer[5] != PROTOCOL_VERSION_1:
+                # Datagrams and telegrams carry no live values, skip them
+                del buffer[:1]
+                continue
+            if max(header) & 0x80 or checksum(header[:8]) != header[8]:
+                self.corrupt_frames += 1
+                del buffer[:1]
+                continue
+
+            frame_count = buffer[8]
+            length = HEADER_LENGTH + frame_count * FRAME_LENGTH
+            if len(buffer) < length:
+                if buffer.find(SYNC_BYTE, 1, len(buffer)) > 0:
+                    # A new packet started before this one was complete
+                    self.corrupt_frames += 1
+                    del buffer[:1]
+                    continue
+                break
+
+            payload = self.__decode_frames(buffer[HEADER_LENGTH:length])
+            if payload is None:
+                self.corrupt_frames += 1
+                del buffer[:1]
+                continue
+
+            packets.append(
+                VBusPacket(
+                    self.channel,
+                    buffer[1] | buffer[2] << 8,
+                    buffer[3] | buffer[4] << 8,
+                    buffer[6] | buffer[7] << 8,
+                    payload,
+                )
+            )
+            del buffer[:length]
+
+        return packets
+
+    @staticmethod
+    def __decode_frames(frames) -> bytes | None:
+        if frames and max(frames) & 0x80:
+            return None
+        words = []
+        for offset in range(0, len(frames), FRAME_LENGTH):
+            if checksum(frames[offset : offset + 5]) != frames[offset + 5]:
+                return None
+            words.append(
+                int.from_bytes(frames[offset : offset + 4], "little")
+                | SEPTETT_BITS[frames[offset + 4] & 0x0F]
+            )
+        return struct.pack(f"<{len(words)}I", *words)
+
+
+class VBusStream:
+    """Turns decoded VBus packets into header sets for the coordinator.
+
+    The latest packet of every (channel, destination, source, command) is
+    kept. Whenever a packet changes a value, on_update is called with the
+    header fingerprint and raw field values in the layout DeltasolLayout uses
+    for the json-live-data-server responses. With a coalesce_delay, changes
+    arriving within that many seconds (a controller sends its packets in
+    bursts) are published together.
+    """
+
+    def __init__(
+        self,
+        specification: VBusSpecification,
+        on_update: Callable[[tuple, list], None],
+        coalesce_delay: float = 0,
+    ) -> None:
+        """Initialise stream."""
+        self.specification = specification
+        self.on_update = on_update
+        self.coalesce_delay = coalesce_delay
+        self._publish_handle: asyncio.TimerHandle | None = None
+        self.decoder = VBusStreamDecoder()
+        # Latest payload, its decoder and decoded values per header id
+        self.packets: dict[str, tuple[bytes, VBusPacketDecoder, list]] = {}
+        self._headers: dict[str, tuple] = {}
+        self._unknown: set[str] = set()
+        self._fingerprint: tuple | None = None
+
+    @staticmethod
+    def header_id(packet: VBusPacket) -> str:
+        """Return the id resol-vbus uses for the header of a packet."""
+        return (
+            f"{packet.channel:02X}_{packet.destination:04X}_{packet.source:04X}"
+            f"_{PROTOCOL_VERSION_1:02X}_{packet.command:04X}"
+        )
+
+    def __header(self, header_id, packet: VBusPacket) -> tuple:
+        template = self.specification.packet_template(
+            packet.destination, packet.source, packet.command
+        )
+        source_name = self.specification.device_name(packet.source, packet.destination)
+        destination_name = self.specification.device_name(
+            packet.destination, packet.source
+        )
+        return (
+            header_id,
+            source_name,
+            destination_name,
+            source_name,
+            tuple((field.id, field.name, field.unit) for field in template.fields),
+        )
+
+    def feed(self, data: bytes) -> None:
+        """Process received bytes."""
+        changed = False
+        for packet in self.decoder.feed(data):
+            header_id = self.header_id(packet)
+            known = self.packets.get(header_id)
+            if known is not None:
+                if known[0] == packet.payload:
+                    continue
+                decoder = known[1]
+            elif header_id in self._unknown:
+                continue
+            else:
+                decoder = self.specification.decoder(
+                    packet.destination, packet.source, packet.command
+                )
+                if decoder is None:
+                    _LOGGER.debug(f"Ignoring unknown VBus packet {header_id}")
+                    self._unknown.add(header_id)
+                    continue
+                self._headers[header_id] = self.__header(header_id, packet)
+                self._fingerprint = None
+            self.packets[header_id] = (
+                packet.payload,
+                decoder,
+                decoder.decode(packet.payload),
+            )
+            changed = True
+
+        if not changed:
+            return
+        if not self.coalesce_delay:
+            self.publish()
+        elif self._publish_handle is None:
+            self._publish_handle = asyncio.get_running_loop().call_later(
+                self.coalesce_delay, self.publish
+            )
+
+    def cancel_publish(self) -> None:
+        """Drop a scheduled publish of coalesced changes."""
+        if self._publish_handle is not None:
+            self._publish_handle.cancel()
+            self._publish_handle = None
+
+    def publish(self) -> None:
+        """Call on_update with the current header set."""
+        self._publish_handle = None
+        header_ids = sorted(self.packets)
+        if self._fingerprint is None:
+            self._fingerprint = tuple(self._headers[i] for i in header_ids)
+        values = []
+        for header_id in header_ids:
+            values.extend(self.packets[header_id][2])
+        self.on_update(self._fingerprint, values)
+
+
+class VBusLanClient(VBusStream):
+    """Streams live data from the TCP port of a VBus/LAN, KM1 or DL2/DL3."""
+
+    def __init__(self, host, port, password, specification, on_update) -> None:
+        """Initialise client."""
+        super().__init__(specification, on_update, VBUS_COALESCE_DELAY)
+        self.host = host
+        self.port = port
+        self.password = password
+
+    async def __expect_ok(self, reader: asyncio.StreamReader, step) -> None:
+        line = await reader.readline()
+        _LOGGER.debug(f"VBus/LAN {step}: {line!r}")
+        if not line.startswith(b"+"):
+            error = f"VBus/LAN at {self.host}:{self.port} refused {step}: {line!r}"
+            _LOGGER.error(error)
+            raise IntegrationError(error)
+
+    async def async_connect(self):
+        """Open the connection and do the PASS/DATA handshake."""
+        async with asyncio.timeout(DEFAULT_TIMEOUT):
+            reader, writer = await asyncio.open_connection(self.host, self.port)
+            try:
+                await self.__expect_ok(reader, "HELLO")
+                writer.write(f"PASS {self.password}\n".encode())
+                await self.__expect_ok(reader, "PASS")
+                writer.write(b"DATA\n")
+                await self.__expect_ok(reader, "DATA")
+            except BaseException:
+                writer.close()
+                raise
+        return reader, writer
+
+    async def async_run(self) -> None:
+        """Stream data until the connection is lost."""
+        reader, writer = await self.async_connect()
+        _LOGGER.info(f"Streaming VBus data from {self.host}:{self.port}")
+        self.decoder = VBusStreamDecoder()
+        try:
+            while data := await reader.read(4096):
+                self.feed(data)
+        finally:
+            writer.close()
+            self.cancel_publish()
+        raise ConnectionError(f"VBus/LAN at {self.host}:{self.port} closed connection")
+
+
+class VBusSerialClient(VBusStream):
+    """Streams live data from a VBus/USB or other serial VBus adapter."""
+
+    def __init__(self, device, specification, on_update) -> None:
+        """Initialise client."""
+        super().__init__(specification, on_update, VBUS_COALESCE_DELAY)
+        self.device = device
+
+    def open(self) -> int:
+        """Open the serial device non-blocking as raw 9600 8N1."""
+        fd = os.open(self.device, os.O_RDWR | os.O_NOCTTY | os.O_NONBLOCK)
+        try:
+            cflag, cc = termios.tcgetattr(fd)[2::4]
+            speed = getattr(termios, f"B{VBUS_SERIAL_BAUDRATE}")
+            cflag = (cflag & ~(termios.CSIZE | termios.PARENB | termios.CSTOPB)) | (
+                termios.CS8 | termios.CREAD | termios.CLOCAL
+            )
+            # Raw mode: no input, output or line processing
+            termios.tcsetattr(fd, termios.TCSANOW, [0, 0, cflag, 0, speed, speed, cc])
+        except BaseException:
+            os.close(fd)
+            raise
+        return fd
+
+    async def async_connect(self) -> None:
+        """Check that the serial device can be opened."""
+        os.close(self.open())
+
+    async def async_run(self) -> None:
+        """Stream data until the device is gone."""
+        fd = self.open()
+        _LOGGER.info(f"Streaming VBus data from {self.device}")
+        self.decoder = VBusStreamDecoder()
+        loop = asyncio.get_running_loop()
+        closed = loop.create_future()
+
+        def read() -> None:
+            try:
+                data = os.read(fd, 4096)
+            except BlockingIOError:
+                return
+            except OSError as e:
+                if not closed.done():
+                    closed.set_exception(e)
+                return
+            if not data:
+                if not closed.done():
+                    closed.set_exception(
+                        ConnectionError(f"VBus device {self.device} closed")
+                    )
+                return
+            self.feed(data)
+
+        loop.add_reader(fd, read)
+        try:
+            await closed
+        finally:
+            loop.remove_reader(fd)
+            os.close(fd)
+            self.cancel_publish()
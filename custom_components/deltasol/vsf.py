@@ -0,0 +1,319 @@
+"""
+Reads the RESOL VBus Specification File (VSF).
+Author: dm82m
+https://github.com/dm82m/hass-Deltasol-KM2
+
+The VSF is the binary file RESOL ships with its tools (and resol-vbus ships as
+vbus_specification.vsf) describing every known VBus device and the fields of
+the packets it sends. Only the parts needed to decode packets are read.
+"""
+
+import logging
+import struct
+from collections import namedtuple
+
+from homeassistant.exceptions import IntegrationError
+
+_LOGGER = logging.getLogger(__name__)
+
+VBusDeviceTemplate = namedtuple(
+    "VBusDeviceTemplate", "self_address, self_mask, peer_address, peer_mask, name"
+)
+
+VBusPacketTemplate = namedtuple(
+    "VBusPacketTemplate",
+    "destination, destination_mask, source, source_mask, command, fields",
+)
+
+VBusFieldTemplate = namedtuple(
+    "VBusFieldTemplate", "id, name, unit, precision, type_id, parts"
+)
+
+# One byte of a packet payload contributing to a field value
+VBusFieldPart = namedtuple("VBusFieldPart", "offset, bit_pos, mask, is_signed, factor")
+
+# struct codes of plain little endian integers by (byte count, signed)
+INTEGER_CODES = {
+    (1, False): "B",
+    (1, True): "b",
+    (2, False): "H",
+    (2, True): "h",
+    (4, False): "I",
+    (4, True): "i",
+}
+
+
+class VBusPacketDecoder:
+    """Decodes all fields of a packet template in one pass.
+
+    Compiled once per packet template from the VSF field parts. Fields that
+    are plain little endian integers are read together by one precompiled
+    struct, the remaining fields (bit fields, counters split over several
+    words) keep their parts as flat tuples.
+    """
+
+    __slots__ = ("count", "integers", "parts", "short_parts", "struct")
+
+    def __init__(self, template: VBusPacketTemplate) -> None:
+        """Compile the decoder of a packet template."""
+        self.count = len(template.fields)
+
+        tables = []
+        integers = []
+        for index, field in enumerate(template.fields):
+            scale = 10**-field.precision if field.precision else 1
+            table = (
+                index,
+                scale,
+                field.precision,
+                tuple(
+                    (p.offset, p.bit_pos, p.mask, p.is_signed, p.factor)
+                    for p in field.parts
+                ),
+            )
+            tables.append(table)
+            integer = self.__integer(field.parts)
+            if integer is not None:
+                integers.append((integer, table))
+
+        # Read the integers with one struct, fields sharing bytes with an
+        # earlier one are decoded from their parts
+        fmt = "<"
+        position = 0
+        compiled = []
+        decoded = set()
+        for (offset, length, code, factor), table in sorted(integers):
+            if offset < position:
+                continue
+            if offset > position:
+                fmt += f"{offset - position}x"
+            fmt += code
+            position = offset + length
+            index, scale, precision, _ = table
+            compiled.append((index, factor * scale, precision))
+            decoded.add(index)
+
+        self.struct = struct.Struct(fmt)
+        self.integers = tuple(compiled)
+        self.parts = tuple(table for table in tables if table[0] not in decoded)
+        # Payloads shorter than the struct are decoded part by part
+        self.short_parts = tuple(tables)
+
+    @staticmethod
+    def __integer(parts) -> tuple | None:
+        """Return (offset, length, code, factor) if parts form a plain integer."""
+        parts = sorted(parts, key=lambda p: p.offset)
+        code = INTEGER_CODES.get((len(parts), bool(parts) and parts[-1].is_signed))
+        if code is None:
+            return None
+        first = parts[0]
+        for i, part in enumerate(parts):
+            if (
+                part.offset != first.offset + i
+                or part.mask != 0xFF
+                or part.bit_pos
+                or part.factor != first.factor * 256**i
+                or (part.is_signed and i != len(parts) - 1)
+            ):
+                return None
+        return first.offset, len(parts), code, first.factor
+
+    def decode(self, payload: bytes) -> list:
+        """Return the raw values of all template fields, in template order."""
+        values = [None] * self.count
+        parts = self.parts
+        if len(payload) >= self.struct.size:
+            for (index, factor, precision), raw in zip(
+                self.integers, self.struct.unpack_from(payload)
+            ):
+                values[index] = round(raw * factor, precision)
+        else:
+            parts = self.short_parts
+
+        length = len(payload)
+        for index, scale, precision, field_parts in parts:
+            value = 0
+            for offset, bit_pos, mask, is_signed, factor in field_parts:
+                if offset >= length:
+                    value = None
+                    break
+                byte = payload[offset]
+                if is_signed and byte & 0x80:
+                    byte -= 0x100
+                if mask != 0xFF:
+                    byte = (byte >> bit_pos) & mask
+                value += byte * factor
+            if value is not None:
+                value = round(value * scale, precision)
+            values[index] = value
+        return values
+
+
+class VBusSpecification:
+    """Device and packet templates of a VBus Specification File."""
+
+    def __init__(self, data_version, devices, packets) -> None:
+        """Initialise specification."""
+        self.data_version = data_version
+        self.devices: list[VBusDeviceTemplate] = devices
+        self.packets: list[VBusPacketTemplate] = packets
+        self._decoders: dict[tuple, VBusPacketDecoder | None] = {}
+
+    @classmethod
+    def load(cls, path) -> "VBusSpecification":
+        """Load the VBus Specification File at path, blocking."""
+        try:
+            with open(path, "rb") as file:
+                buffer = file.read()
+        except OSError as e:
+            error = f"Could not read VBus Specification File {path} - {e}"
+            _LOGGER.error(error)
+            raise IntegrationError(error)
+        return cls.parse(buffer)
+
+    @classmethod
+    def parse(cls, buffer: bytes) -> "VBusSpecification":
+        """Parse the content of a VBus Specification File."""
+        try:
+            return cls.__parse(buffer)
+        except (struct.error, IndexError, UnicodeDecodeError) as e:
+            error = f"Invalid VBus Specification File - {e}"
+            _LOGGER.error(error)
+            raise IntegrationError(error)
+
+    @classmethod
+    def __parse(cls, buffer: bytes) -> "VBusSpecification":
+        total_length, data_version, spec_offset = struct.unpack_from("<iii", buffer, 4)
+        if total_length != len(buffer):
+            raise IndexError(f"length {len(buffer)} does not match {total_length}")
+
+        (
+            _datecode,
+            text_count,
+            text_table,
+            localized_text_count,
+            localized_text_table,
+            _unit_family_count,
+            _unit_family_table,
+            unit_count,
+            unit_table,
+            device_count,
+            device_table,
+            packet_count,
+            packet_table,
+        ) = struct.unpack_from("<13i", buffer, spec_offset)
+
+        texts = []
+        for offset in struct.unpack_from(f"<{text_count}i", buffer, text_table):
+            end = buffer.index(b"\0", offset)
+            texts.append(buffer[offset:end].decode("utf-8"))
+
+        # Localized texts are (english, german, french) text indices
+        names = [
+            texts[english]
+            for english, _german, _french in struct.iter_unpack(
+                "<3i", buffer[localized_text_table:][: localized_text_count * 12]
+            )
+        ]
+
+        units = {
+            unit_id: texts[unit_text]
+            for unit_id, _family, _code, unit_text in struct.iter_unpack(
+                "<4i", buffer[unit_table:][: unit_count * 16]
+            )
+        }
+
+        devices = [
+            VBusDeviceTemplate(
+                self_address, self_mask, peer_address, peer_mask, names[name]
+            )
+            for self_address, self_mask, peer_address, peer_mask, name in struct.iter_unpack(
+                "<4Hi", buffer[device_table:][: device_count * 12]
+            )
+        ]
+
+        packets = []
+        for (
+            destination,
+            destination_mask,
+            source,
+            source_mask,
+            command,
+            _reserved,
+            field_count,
+            field_table,
+        ) in struct.iter_unpack("<6H2i", buffer[packet_table:][: packet_count * 20]):
+            fields = []
+            for (
+                id_text,
+                name,
+                unit_id,
+                precision,
+                type_id,
+                part_count,
+                part_table,
+            ) in struct.iter_unpack("<7i", buffer[field_table:][: field_count * 28]):
+                parts = [
+                    VBusFieldPart(offset, bit_pos, mask, bool(is_signed), factor)
+                    for offset, bit_pos, mask, is_signed, _reserved, factor in struct.iter_unpack(
+                        "<i4Bq", buffer[part_table:][: part_count * 16]
+                    )
+                ]
+                fields.append(
+                    VBusFieldTemplate(
+                        id=texts[id_text],
+                        name=names[name],
+                        unit=units.get(unit_id, ""),
+                        precision=precision,
+                        type_id=type_id,
+                        parts=parts,
+                    )
+                )
+            packets.append(
+                VBusPacketTemplate(
+                    destination,
+                    destination_mask,
+                    source,
+                    source_mask,
+                    command,
+                    fields,
+                )
+            )
+
+        _LOGGER.debug(
+            f"Loaded VBus Specification File version {data_version} with "
+            f"{len(devices)} devices and {len(packets)} packets"
+        )
+        return cls(data_version, devices, packets)
+
+    def device_name(self, address, peer_address) -> str:
+        """Return the name of the device at address as seen from peer_address."""
+        for device in self.devices:
+            if (address & device.self_mask) == device.self_address and (
+                peer_address & device.peer_mask
+            ) == device.peer_address:
+                return device.name
+        return f"Unknown device 0x{address:04X}"
+
+    def packet_template(
+        self, destination, source, command
+    ) -> VBusPacketTemplate | None:
+        """Return the template of a packet, None if it is unknown."""
+        for packet in self.packets:
+            if (
+                (destination & packet.destination_mask) == packet.destination
+                and (source & packet.source_mask) == packet.source
+                and command == packet.command
+            ):
+                return packet
+        return None
+
+    def decoder(self, destination, source, command) -> VBusPacketDecoder | None:
+        """Return the compiled decoder of a packet, None if it is unknown."""
+        key = (destination, source, command)
+        if key not in self._decoders:
+            template = self.packet_template(destination, source, command)
+            self._decoders[key] = (
+                VBusPacketDecoder(template) if template is not None else None
+            )
+        return self._decoders[key]
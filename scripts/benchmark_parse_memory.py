@@ -0,0 +1,216 @@
+"""
+Measures the peak memory of parsing live responses against payload size.
+Author: dm82m
+https://github.com/dm82m/hass-Deltasol-KM2
+
+Usage: python scripts/benchmark_parse_memory.py [--sizes 1,4,16,64]
+
+Every size is the number of headers with 64 fields each. For every size the
+whole-body parse (read the body, json.loads, walk the tree) and the streamed
+parse of DeltasolApi.fetch_data_dlx are run in a fresh interpreter, which
+reports its peak RSS and the peak of memory allocated while parsing the
+first poll (including compiling the field layout) and a following poll.
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import resource
+import subprocess
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+FIELDS = 64
+
+
+def payload_chunks(headers: int, timestamp: int = 1700000000):
+    """Yield a DL2/DL3 live response of headers headers piece by piece."""
+    yield b'{"language": "en", "headers": ['
+    for h in range(headers):
+        header = {
+            "id": f"00_0010_{h:04X}_10_0100",
+            "description": "DeltaSol MX [Regler]",
+            "destination_name": "DFA",
+            "source_name": f"DeltaSol MX [Modul {h}]",
+            "fields": [
+                {
+                    "id": f"{f * 2:03d}_2_0",
+                    "name": f"Temperature sensor {f}",
+                    "unit": " °C",
+                }
+                for f in range(FIELDS)
+            ],
+        }
+        yield (", " if h else "").encode() + json.dumps(header).encode()
+    yield f'], "headersets": [{{"timestamp": {timestamp}, "packets": ['.encode()
+    for h in range(headers):
+        packet = {
+            "header_index": h,
+            "field_values": [
+                {
+                    "field_index": f,
+                    "raw_value": 20.0 + f / 10,
+                    "value": f"{20 + f / 10:.1f}",
+                }
+                for f in range(FIELDS)
+            ],
+        }
+        yield (", " if h else "").encode() + json.dumps(packet).encode()
+    yield b"]}]}"
+
+
+class Response:
+    """Minimal streamed aiohttp response."""
+
+    status = 200
+    content_length = None
+
+    def __init__(self, headers: int, timestamp: int) -> None:
+        """Initialise response."""
+        self.headers = headers
+        self.timestamp = timestamp
+        self.content = self
+
+    async def iter_chunked(self, size):
+        """Yield the body in chunks of at most size bytes."""
+        buffer = b""
+        for piece in payload_chunks(self.headers, self.timestamp):
+            buffer += piece
+            while len(buffer) >= size:
+                yield buffer[:size]
+                buffer = buffer[size:]
+        if buffer:
+            yield buffer
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        return None
+
+
+class Session:
+    """Session returning the streamed response."""
+
+    def __init__(self, headers: int) -> None:
+        """Initialise session."""
+        self.headers = headers
+        self.polls = 0
+
+    def get(self, url, **kwargs) -> Response:
+        """Return the response of the next poll."""
+        self.polls += 1
+        return Response(self.headers, 1700000000 + self.polls)
+
+
+def polls_whole(headers: int):
+    """Parse like before streaming: whole body, whole tree, then walk it."""
+    from custom_components.deltasol.deltasolapi import DeltasolLayout
+
+    layout = None
+    for poll in itertools.count(1):
+        body = b"".join(payload_chunks(headers, 1700000000 + poll))
+        response = json.loads(body)
+        fingerprint = DeltasolLayout.fingerprint_of(response["headers"])
+        if layout is None or fingerprint != layout.fingerprint:
+            layout = DeltasolLayout(fingerprint)
+        packets = response["headersets"][0]["packets"]
+        yield [
+            packets[field.header_index]["field_values"][field.field_index]["raw_value"]
+            for field in layout.fields
+        ]
+
+
+def polls_stream(headers: int):
+    """Parse with the streamed DL2/DL3 fetch."""
+    from custom_components.deltasol.deltasolapi import DeltasolApi
+
+    api = DeltasolApi(Session(headers), "localhost", 80)
+    api.product = "dl2"
+    loop = asyncio.new_event_loop()
+    while True:
+        yield loop.run_until_complete(api.fetch_data()).values
+
+
+def measure(mode: str, headers: int) -> None:
+    """Run two polls and print their memory figures as JSON."""
+    # Import everything before measuring
+    import custom_components.deltasol.deltasolapi  # noqa: F401
+
+    size = sum(len(piece) for piece in payload_chunks(headers))
+    polls = (polls_stream if mode == "stream" else polls_whole)(headers)
+    tracemalloc.start()
+    fields = len(next(polls))
+    _, first = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    current, _ = tracemalloc.get_traced_memory()
+    next(polls)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        rss //= 1024
+    print(
+        json.dumps(
+            {
+                "size": size,
+                "fields": fields,
+                "first": first,
+                "next": peak - current,
+                "rss": rss,
+            }
+        )
+    )
+
+
+def main() -> None:
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--sizes", default="1,4,16,64,256")
+    parser.add_argument("--measure", choices=["whole", "stream"])
+    parser.add_argument("--headers", type=int)
+    args = parser.parse_args()
+
+    if args.measure:
+        measure(args.measure, args.headers)
+        return
+
+    print("Peak memory allocated while parsing the first and a following poll")
+    print(
+        f"{'headers':>7} {'fields':>7} {'payload':>10} | {'whole: first':>12} "
+        f"{'next':>9} {'RSS':>8} | {'stream: first':>13} {'next':>9} {'RSS':>8}"
+    )
+    for headers in (int(size) for size in args.sizes.split(",")):
+        results = {}
+        for mode in ("whole", "stream"):
+            output = subprocess.run(
+                [
+                    sys.executable,
+                    __file__,
+                    "--measure",
+                    mode,
+                    "--headers",
+                    str(headers),
+                ],
+                capture_output=True,
+                check=True,
+                text=True,
+            ).stdout
+            results[mode] = json.loads(output)
+        whole, stream = results["whole"], results["stream"]
+        print(
+            f"{headers:>7} {whole['fields']:>7} {whole['size'] / 1024:>7.0f} kB | "
+            + " | ".join(
+                f"{result['first'] / 1024:>{width}.0f} kB "
+                f"{result['next'] / 1024:>6.0f} kB {result['rss'] / 1024:>5.1f} MB"
+                for result, width in ((whole, 9), (stream, 10))
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
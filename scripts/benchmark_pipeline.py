@@ -0,0 +1,308 @@
+"""
+Measures the poll pipeline from device response to entity state.
+Author: dm82m
+https://github.com/dm82m/hass-Deltasol-KM2
+
+Usage: python scripts/benchmark_pipeline.py [--headers 1,8,32] [--fields 16,64]
+           [--output results.json] [--compare baseline.json]
+
+Requires Home Assistant to be installed. For every product (KM2 JSON-RPC, DL2/DL3 live) and payload size of headers x
+fields, a synthetic response with float, integer and date fields is parsed
+by DeltasolApi.fetch_data. Measured are the first poll (compiling the field
+layout), following polls with new values and polls the device has not
+refreshed, then the change detection of the coordinator with and without
+deadbands and the state properties every sensor entity reads on an update.
+
+Every stage reports the median and minimum time, the peak of memory
+allocated while it runs and the memory and number of blocks it leaves
+allocated. --output writes the results as JSON, --compare reports the
+stages that got slower than a previous output by more than --tolerance and
+exits with status 1 if any did. Stages are compared by their minimum time.
+"""
+
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from collections.abc import Callable
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from synthetic_payload import payload
+
+from custom_components.deltasol.deadband import DeadbandFilter, parse_deadbands
+from custom_components.deltasol.deltasolapi import DeltasolApi, DeltasolData
+from custom_components.deltasol.sensor import DeltasolSensor
+
+MANIFEST = os.path.join(
+    os.path.dirname(__file__), "..", "custom_components", "deltasol", "manifest.json"
+)
+PRODUCT_DETAILS = {
+    "vendor": "RESOL",
+    "name": "Benchmark",
+    "serial": "001E66000000",
+    "version": "2.2.0",
+    "build": "201811281350",
+    "features": "vbus,dl2",
+}
+
+
+class Response:
+    """Minimal aiohttp response streaming a body."""
+
+    status = 200
+
+    def __init__(self, body: bytes) -> None:
+        """Initialise response."""
+        self.body = body
+        self.headers = {}
+        self.content_length = len(body)
+        self.content = self
+
+    async def iter_chunked(self, size):
+        """Yield the body in chunks of at most size bytes."""
+        for start in range(0, len(self.body), size):
+            yield self.body[start : start + size]
+
+    async def read(self) -> bytes:
+        """Return the whole body."""
+        return self.body
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        return None
+
+
+class Session:
+    """Session answering KM2 and DL2/DL3 requests with synthetic payloads."""
+
+    def __init__(self, headers: int, fields: int, product: str) -> None:
+        """Initialise session."""
+        self.product = product
+        self.timestamp = 1700000000
+        self.bodies = {}
+        self.body = b""
+        for timestamp in (self.timestamp, self.timestamp + 1):
+            # Prepared beforehand, so serializing is not measured
+            self.bodies[timestamp] = payload(headers, fields, timestamp, product)
+        self.refresh(self.timestamp)
+
+    def refresh(self, timestamp: int) -> None:
+        """Let the device report the values of timestamp."""
+        self.body = self.bodies[timestamp]
+
+    def get(self, url, **kwargs) -> Response:
+        """Answer a DL2/DL3 live request."""
+        return Response(self.body)
+
+    def post(self, url, data="", **kwargs) -> Response:
+        """Answer a KM2 JSON-RPC request."""
+        if "'login'" in data:
+            return Response(b'[{"id": "1", "result": {"authId": "bench"}}]')
+        return Response(self.body)
+
+
+def new_api(session: Session) -> DeltasolApi:
+    """Return an api whose product is already detected."""
+    api = DeltasolApi(session, "localhost", 80, "admin", "admin")
+    api.product = session.product
+    api.product_details = PRODUCT_DETAILS
+    return api
+
+
+def measure(stage: Callable, prepare: Callable | None, repeat: int) -> dict:
+    """Time stage repeat times, then trace the allocations of one more run.
+
+    prepare is run untimed before every run and its result passed to stage.
+    """
+    times = []
+    for _ in range(repeat):
+        argument = prepare() if prepare else None
+        start = time.perf_counter()
+        stage(argument)
+        times.append(time.perf_counter() - start)
+
+    argument = prepare() if prepare else None
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    tracemalloc.reset_peak()
+    start_size, _ = tracemalloc.get_traced_memory()
+    result = stage(argument)
+    size, peak = tracemalloc.get_traced_memory()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    del result
+    blocks = sum(stat.count_diff for stat in after.compare_to(before, "filename"))
+    return {
+        "median_us": round(statistics.median(times) * 1e6, 1),
+        "min_us": round(min(times) * 1e6, 1),
+        "peak_bytes": peak - start_size,
+        "retained_bytes": size - start_size,
+        "retained_blocks": blocks,
+    }
+
+
+def entity_stage(data: DeltasolData):
+    """Return a stage reading the state of every sensor."""
+    coordinator = SimpleNamespace(data=data, aggregator=None, last_update_success=True)
+    sensors = [
+        DeltasolSensor(coordinator, "benchmark", field) for field in data.layout.fields
+    ]
+
+    def update(argument) -> None:
+        for sensor in sensors:
+            # The properties async_write_ha_state reads from the integration
+            sensor.native_value  # noqa: B018
+            sensor.native_unit_of_measurement  # noqa: B018
+            sensor.extra_state_attributes  # noqa: B018
+
+    return update
+
+
+def run(product: str, headers: int, fields: int, repeat: int) -> dict:
+    """Return the measurements of every stage for one product and size."""
+    loop = asyncio.new_event_loop()
+    session = Session(headers, fields, product)
+    first = session.timestamp
+
+    def poll(api: DeltasolApi) -> DeltasolData:
+        return loop.run_until_complete(api.fetch_data())
+
+    def fresh_api() -> DeltasolApi:
+        session.refresh(first)
+        return new_api(session)
+
+    api = new_api(session)
+    poll(api)
+    timestamps = iter(range(10**9))
+
+    def refreshed_api() -> DeltasolApi:
+        # Alternate the reported data, so every poll parses new values
+        session.refresh(first + next(timestamps) % 2)
+        return api
+
+    previous = poll(api)
+    session.refresh(first + 1 if api.device_timestamp == first else first)
+    current = poll(api)
+    deadband = DeadbandFilter(parse_deadbands("°C=0.5"), 3600)
+
+    def deadband_changed(argument):
+        deadband.reset(previous, 0.0)
+        return deadband.changed(previous, current, 1.0)
+
+    stages = {
+        "parse_first": measure(poll, fresh_api, repeat),
+        "parse_next": measure(poll, refreshed_api, repeat),
+        "parse_unchanged": measure(poll, lambda: api, repeat),
+        "changed_ids": measure(lambda _: current.changed_ids(previous), None, repeat),
+        "deadband_changed": measure(deadband_changed, None, repeat),
+    }
+    stages["entity_update"] = measure(entity_stage(current), None, repeat)
+    # Finalize the responses left unread by the unchanged polls
+    loop.run_until_complete(loop.shutdown_asyncgens())
+    loop.close()
+
+    count = len(current)
+    for result in stages.values():
+        result["per_field_us"] = round(result["median_us"] / count, 3)
+    return {
+        "product": product,
+        "headers": headers,
+        "fields": fields,
+        "entities": count,
+        "payload_bytes": len(session.body),
+        "changed_fields": len(current.changed_ids(previous)),
+        "stages": stages,
+    }
+
+
+def compare(results: list[dict], baseline_path: str, tolerance: float) -> bool:
+    """Print stages slower than in baseline, return True if there are any."""
+    with open(baseline_path, encoding="utf-8") as file:
+        baseline = {
+            (result["product"], result["headers"], result["fields"]): result
+            for result in json.load(file)["results"]
+        }
+    regressed = False
+    for result in results:
+        old = baseline.get((result["product"], result["headers"], result["fields"]))
+        if old is None:
+            continue
+        for stage, measured in result["stages"].items():
+            if stage not in old["stages"]:
+                continue
+            # The minimum is least affected by other load on the machine
+            ratio = measured["min_us"] / max(old["stages"][stage]["min_us"], 0.1)
+            if ratio > tolerance:
+                regressed = True
+                print(
+                    f"Regression: {result['product']} {result['headers']}x"
+                    f"{result['fields']} {stage} {ratio:.2f}x slower"
+                )
+    return regressed
+
+
+def main() -> None:
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--headers", default="1,8,32")
+    parser.add_argument("--fields", default="16,64")
+    parser.add_argument("--products", default="km2,dl2")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--compare", help="JSON results of a previous run")
+    parser.add_argument("--tolerance", type=float, default=1.25)
+    args = parser.parse_args()
+
+    with open(MANIFEST, encoding="utf-8") as file:
+        version = json.load(file)["version"]
+    results = []
+    print(
+        f"{'product':>7} {'fields':>11} {'payload':>9} {'stage':>16} "
+        f"{'median':>10} {'per field':>10} {'peak':>9} {'retained':>9} {'blocks':>7}"
+    )
+    for product in args.products.split(","):
+        for headers in (int(size) for size in args.headers.split(",")):
+            for fields in (int(size) for size in args.fields.split(",")):
+                result = run(product, headers, fields, args.repeat)
+                results.append(result)
+                for stage, measured in result["stages"].items():
+                    print(
+                        f"{product:>7} {f'{headers}x{fields}':>11} "
+                        f"{result['payload_bytes'] / 1024:>6.0f} kB {stage:>16} "
+                        f"{measured['median_us']:>7.0f} us "
+                        f"{measured['per_field_us']:>7.2f} us "
+                        f"{measured['peak_bytes'] / 1024:>6.0f} kB "
+                        f"{measured['retained_bytes'] / 1024:>6.0f} kB "
+                        f"{measured['retained_blocks']:>7}"
+                    )
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(
+                {
+                    "version": version,
+                    "created": datetime.datetime.now(datetime.UTC).isoformat(),
+                    "python": platform.python_version(),
+                    "platform": platform.platform(),
+                    "repeat": args.repeat,
+                    "results": results,
+                },
+                file,
+                indent=2,
+            )
+    if args.compare and compare(results, args.compare, args.tolerance):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
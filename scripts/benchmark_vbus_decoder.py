@@ -0,0 +1,196 @@
+"""
+Measures the VBus decoding throughput in packets per second.
+Author: dm82m
+https://github.com/dm82m/hass-Deltasol-KM2
+
+Usage: python scripts/benchmark_vbus_decoder.py [path/to/vbus_specification.vsf]
+
+Without a VSF a synthetic controller packet with 32 temperature sensors,
+8 relays and two split heat quantity counters is used. With a VSF every
+packet template of the file is benchmarked with random payloads.
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from custom_components.deltasol.vbus import (
+    FRAME_LENGTH,
+    HEADER_LENGTH,
+    PROTOCOL_VERSION_1,
+    SYNC_BYTE,
+    VBusStream,
+    checksum,
+)
+from custom_components.deltasol.vsf import (
+    VBusDeviceTemplate,
+    VBusFieldPart,
+    VBusFieldTemplate,
+    VBusPacketDecoder,
+    VBusPacketTemplate,
+    VBusSpecification,
+)
+
+
+def synthetic_specification() -> VBusSpecification:
+    """Return a specification with one large controller packet."""
+    fields = [
+        VBusFieldTemplate(
+            f"{i * 2:03d}_2_0",
+            f"Temperature sensor {i + 1}",
+            " °C",
+            1,
+            1,
+            [
+                VBusFieldPart(i * 2, 0, 0xFF, False, 1),
+                VBusFieldPart(i * 2 + 1, 0, 0xFF, True, 256),
+            ],
+        )
+        for i in range(32)
+    ]
+    fields += [
+        VBusFieldTemplate(
+            f"{64 + i:03d}_1_0",
+            f"Pump speed relay {i + 1}",
+            " %",
+            0,
+            1,
+            [VBusFieldPart(64 + i, 0, 0xFF, False, 1)],
+        )
+        for i in range(8)
+    ]
+    fields += [
+        VBusFieldTemplate(
+            f"{72 + i * 8:03d}_4_0",
+            f"Heat quantity {i + 1}",
+            " Wh",
+            0,
+            1,
+            [
+                VBusFieldPart(72 + i * 8, 0, 0xFF, False, 1),
+                VBusFieldPart(73 + i * 8, 0, 0xFF, False, 256),
+                VBusFieldPart(74 + i * 8, 0, 0xFF, False, 1000),
+                VBusFieldPart(75 + i * 8, 0, 0xFF, False, 256000),
+            ],
+        )
+        for i in range(2)
+    ]
+    fields.append(
+        VBusFieldTemplate(
+            "088_1_0",
+            "Sensor line break",
+            "",
+            0,
+            1,
+            [VBusFieldPart(88, 0, 0x01, False, 1)],
+        )
+    )
+    return VBusSpecification(
+        0,
+        [
+            VBusDeviceTemplate(0x7E11, 0xFFFF, 0, 0, "DeltaSol MX [Regler]"),
+            VBusDeviceTemplate(0x0010, 0xFFFF, 0, 0, "DFA"),
+        ],
+        [VBusPacketTemplate(0x0010, 0xFFFF, 0x7E11, 0xFFFF, 0x0100, fields)],
+    )
+
+
+def payload_length(template: VBusPacketTemplate) -> int:
+    """Return the payload length covering all fields, rounded to frames."""
+    end = max((p.offset + 1 for f in template.fields for p in f.parts), default=0)
+    return end + (-end % 4)
+
+
+def encode_packet(destination, source, command, payload: bytes) -> bytes:
+    """Return the VBus protocol version 1 bytes of a packet."""
+    header = bytes(
+        [
+            destination & 0xFF,
+            destination >> 8,
+            source & 0xFF,
+            source >> 8,
+            PROTOCOL_VERSION_1,
+            command & 0xFF,
+            command >> 8,
+            len(payload) // 4,
+        ]
+    )
+    data = bytearray([SYNC_BYTE, *header, checksum(header)])
+    for offset in range(0, len(payload), 4):
+        frame = payload[offset : offset + 4]
+        septett = sum(1 << i for i, byte in enumerate(frame) if byte & 0x80)
+        frame = bytes([byte & 0x7F for byte in frame] + [septett])
+        data += frame + bytes([checksum(frame)])
+    assert len(data) == HEADER_LENGTH + len(payload) // 4 * FRAME_LENGTH
+    return bytes(data)
+
+
+def measure(function, count) -> float:
+    """Return calls of function per second."""
+    start = time.perf_counter()
+    for _ in range(count):
+        function()
+    return count / (time.perf_counter() - start)
+
+
+def main() -> None:
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("vsf", nargs="?", help="VBus Specification File")
+    parser.add_argument("--packets", type=int, default=20000)
+    args = parser.parse_args()
+
+    if args.vsf:
+        specification = VBusSpecification.load(args.vsf)
+    else:
+        specification = synthetic_specification()
+    templates = [t for t in specification.packets if t.fields]
+
+    start = time.perf_counter()
+    decoders = [VBusPacketDecoder(template) for template in templates]
+    compile_time = time.perf_counter() - start
+    fields = sum(len(t.fields) for t in templates)
+    print(
+        f"Compiled {len(decoders)} packet templates with {fields} fields "
+        f"in {compile_time * 1000:.1f} ms"
+    )
+
+    random.seed(0)
+    payloads = [
+        bytes(random.randrange(256) for _ in range(payload_length(template)))
+        for template in templates
+    ]
+
+    # Field decoding only
+    count = max(args.packets // len(decoders), 1)
+    rates = [
+        measure(lambda d=decoder, p=payload: d.decode(p), count)
+        for decoder, payload in zip(decoders, payloads)
+    ]
+    print(
+        f"Field decoding: {sum(rates) / len(rates):,.0f} packets/s "
+        f"({fields / len(decoders) * sum(rates) / len(rates):,.0f} fields/s)"
+    )
+
+    # Whole pipeline of the synthetic packet: frames, checksums, fields
+    template = templates[0]
+    stream = VBusStream(specification, lambda fingerprint, values: None)
+    packets = []
+    for _ in range(64):
+        payload = bytes(random.randrange(256) for _ in range(payload_length(template)))
+        packets.append(
+            encode_packet(
+                template.destination, template.source, template.command, payload
+            )
+        )
+    data = b"".join(packets)
+    rate = measure(lambda: stream.feed(data), max(args.packets // len(packets), 1))
+    print(f"Stream decoding: {rate * len(packets):,.0f} packets/s")
+
+
+if __name__ == "__main__":
+    main()
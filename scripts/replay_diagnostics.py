@@ -0,0 +1,176 @@
+"""
+Replays the responses of a diagnostics download offline.
+Author: dm82m
+https://github.com/dm82m/hass-Deltasol-KM2
+
+Usage: python scripts/replay_diagnostics.py diagnostics.json [--repeat 20]
+           [--profile]
+
+Requires Home Assistant to be installed. Every raw response captured in the diagnostics download of a config entry
+is parsed again by DeltasolApi, with the field selection of the entry, and
+its parse time is compared to the timing captured on the device. The fields
+of the last response are listed as the sensors would report them, with
+device and state class. --profile runs the
+parses under cProfile and prints the most expensive functions.
+"""
+
+import argparse
+import asyncio
+import cProfile
+import json
+import os
+import pstats
+import sys
+import time
+import traceback
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from benchmark_pipeline import Response
+
+from custom_components.deltasol.const import CONF_EXCLUDE, CONF_INCLUDE
+from custom_components.deltasol.deltasolapi import (
+    DeltasolApi,
+    DeltasolData,
+    DeltasolSelection,
+)
+from custom_components.deltasol.sensor import DeltasolSensor
+
+
+class ReplaySession:
+    """Session answering every request with one captured body."""
+
+    def __init__(self, body: bytes) -> None:
+        """Initialise session."""
+        self.body = body
+
+    def get(self, url, **kwargs) -> Response:
+        """Answer a DL2/DL3 live request."""
+        return Response(self.body)
+
+    def post(self, url, data="", **kwargs) -> Response:
+        """Answer a KM2 JSON-RPC request."""
+        if "'login'" in data:
+            return Response(b'[{"id": "1", "result": {"authId": "replay"}}]')
+        return Response(self.body)
+
+
+def replay(response: dict, selection: DeltasolSelection) -> DeltasolData:
+    """Parse a captured response with a new api, as on the first poll."""
+    source = response["source"]
+    api = DeltasolApi(
+        ReplaySession(response["body"].encode()),
+        "replay",
+        80,
+        "replay",
+        "replay",
+        # The filter of a DL2/DL3 response is named after the colon
+        source.partition(":")[2] or None,
+        selection,
+    )
+    api.product = "km2" if source == "km2" else "dl2"
+    api.product_details = {}
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(api.fetch_data())
+    finally:
+        loop.close()
+
+
+def sensor_rows(data: DeltasolData) -> list[tuple]:
+    """Return unique_id, name, value, unit, device and state class per sensor."""
+    coordinator = SimpleNamespace(data=data, aggregator=None, last_update_success=True)
+    rows = []
+    for field in data.layout.fields:
+        sensor = DeltasolSensor(coordinator, "replay", field)
+        rows.append(
+            (
+                field.unique_id,
+                field.name,
+                sensor.native_value,
+                sensor.native_unit_of_measurement,
+                sensor.device_class or "",
+                sensor.state_class or "",
+            )
+        )
+    return rows
+
+
+def main() -> None:
+    """Run the replay."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("diagnostics")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--profile", action="store_true")
+    args = parser.parse_args()
+
+    with open(args.diagnostics, encoding="utf-8") as file:
+        bundle = json.load(file)
+    # Downloads of Home Assistant wrap the diagnostics of the integration
+    diagnostics = bundle.get("data", bundle)
+    entry = diagnostics.get("config_entry", {})
+    selection = DeltasolSelection(entry.get(CONF_INCLUDE), entry.get(CONF_EXCLUDE))
+    responses = diagnostics.get("responses", [])
+    print(
+        f"Product {diagnostics.get('product')}, {len(responses)} captured "
+        f"response(s), timings captured on the device in ms"
+    )
+    print(
+        f"{'time':>32} {'source':>12} {'size':>9} {'request':>8} {'receive':>8} "
+        f"{'parse':>8} | {'replay':>8} {'fields':>6}"
+    )
+
+    last = None
+    profile = cProfile.Profile() if args.profile else None
+    for response in responses:
+        captured = response.get("timings_ms", {})
+        body = response.get("body")
+        prefix = (
+            f"{response['time']:>32} {response['source']:>12} "
+            f"{len(body or '') / 1024:>6.0f} kB "
+            + " ".join(
+                f"{captured.get(phase) or 0:>8.2f}"
+                for phase in ("request", "receive", "parse")
+            )
+        )
+        if body is None:
+            print(f"{prefix} | skipped, over the capture limit or not JSON")
+            continue
+        times = []
+        try:
+            for _ in range(args.repeat):
+                if profile:
+                    profile.enable()
+                start = time.perf_counter()
+                data = replay(response, selection)
+                times.append(time.perf_counter() - start)
+                if profile:
+                    profile.disable()
+        except Exception:  # noqa: BLE001
+            print(f"{prefix} | failed:")
+            traceback.print_exc()
+            continue
+        last = data
+        print(f"{prefix} | {min(times) * 1000:>8.2f} {len(data):>6}")
+
+    if last is not None:
+        print()
+        print(
+            f"{'unique_id':>40} {'name':>32} {'value':>26} {'unit':>6} "
+            f"{'device class':>16} {'state class':>16}"
+        )
+        for unique_id, name, value, unit, device_class, state_class in sensor_rows(
+            last
+        ):
+            print(
+                f"{unique_id:>40} {name:>32} {value!s:>26} {unit or '':>6} "
+                f"{device_class!s:>16} {state_class!s:>16}"
+            )
+    if profile:
+        print()
+        pstats.Stats(profile).sort_stats("cumulative").print_stats(25)
+
+
+if __name__ == "__main__":
+    main()
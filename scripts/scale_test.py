@@ -0,0 +1,316 @@
+"""
+Runs many DeltasolCoordinators at once against a simulated device fleet.
+Author: dm82m
+https://github.com/dm82m/hass-Deltasol-KM2
+
+Usage: python scripts/scale_test.py [--devices 1,10,50,100] [--duration 60]
+           [--scan-interval 10] [--output results.json] [-- simulator args]
+
+Requires Home Assistant to be installed. For every fleet size the device
+simulator (simulate_devices.py, arguments after -- are passed on) is
+started in its own process and one config entry per device (or
+--entries-per-device entries sharing a device) is run in a bare Home
+Assistant instance, with one listener per field like the sensor entities.
+
+Reported per fleet size are the time until every entry has data, poll
+latency percentiles and failures, the event loop lag, the delay of jobs
+queued to the executor and the memory of the process. Scan intervals
+below the integration's minimum of 60 seconds compress the test.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import MappingProxyType
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from homeassistant.const import (
+    CONF_HOST,
+    CONF_PASSWORD,
+    CONF_PORT,
+    CONF_SCAN_INTERVAL,
+    CONF_USERNAME,
+)
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers import frame
+from homeassistant.setup import async_setup_component
+
+import custom_components.deltasol
+from custom_components.deltasol import DeltasolCoordinator
+
+SIMULATOR = os.path.join(os.path.dirname(__file__), "simulate_devices.py")
+# Interval of the event loop lag and executor probes
+PROBE_INTERVAL = 0.05
+
+
+class ScaleConfigEntry:
+    """The parts of a config entry the coordinator uses."""
+
+    def __init__(self, entry_id: str, data: dict) -> None:
+        """Initialise config entry."""
+        self.entry_id = entry_id
+        self.data = MappingProxyType(data)
+        self.options = MappingProxyType({})
+        self._on_unload = []
+
+    def async_on_unload(self, func) -> None:
+        """Call func when the test ends."""
+        self._on_unload.append(func)
+
+    def unload(self) -> None:
+        """Call the unload callbacks."""
+        while self._on_unload:
+            self._on_unload.pop()()
+
+
+def percentile(values: list[float], percent: float) -> float | None:
+    """Return the percentile of values, None if there are none."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * percent / 100), len(ordered) - 1)]
+
+
+def summary(values: list[float], scale: float = 1000) -> dict:
+    """Return count, p50, p90, p99 and max of values in milliseconds."""
+    return {
+        "count": len(values),
+        **{
+            name: None if value is None else round(value * scale, 2)
+            for name, value in (
+                ("p50", percentile(values, 50)),
+                ("p90", percentile(values, 90)),
+                ("p99", percentile(values, 99)),
+                ("max", max(values, default=None)),
+            )
+        },
+    }
+
+
+def rss_mb() -> float:
+    """Return the current resident memory of the process in MB."""
+    try:
+        with open("/proc/self/statm", encoding="ascii") as file:
+            return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:
+        # Peak instead of current outside Linux
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2**20 if sys.platform == "darwin" else peak / 1024
+
+
+async def probe_loop(lags: list[float], stop: asyncio.Event) -> None:
+    """Record how late the event loop wakes up a sleeping task."""
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        expected = loop.time() + PROBE_INTERVAL
+        await asyncio.sleep(PROBE_INTERVAL)
+        lags.append(max(loop.time() - expected, 0))
+
+
+async def probe_executor(
+    hass: HomeAssistant, delays: list[float], stop: asyncio.Event
+) -> None:
+    """Record how long a job queued to the executor waits for a thread."""
+    while not stop.is_set():
+        queued = time.monotonic()
+        started = await hass.async_add_executor_job(time.monotonic)
+        delays.append(started - queued)
+        await asyncio.sleep(PROBE_INTERVAL)
+
+
+async def run(args: argparse.Namespace, devices: int, simulator_args: list) -> dict:
+    """Run one fleet size and return its measurements."""
+    simulator = await asyncio.create_subprocess_exec(
+        sys.executable,
+        SIMULATOR,
+        "--devices",
+        str(devices),
+        "--port",
+        str(args.port),
+        *simulator_args,
+        stdout=subprocess.PIPE,
+    )
+    await simulator.stdout.readline()
+    rss_start = rss_mb()
+
+    config_dir = tempfile.mkdtemp(prefix="deltasol-scale-")
+    hass = HomeAssistant(config_dir)
+    frame.async_setup(hass)
+    # The shared client session of Home Assistant depends on the network setup
+    await async_setup_component(hass, "network", {})
+
+    latencies: list[float] = []
+    failures: dict[str, int] = {}
+    updates = [0]
+
+    def timed(update):
+        async def update_method():
+            start = time.monotonic()
+            try:
+                return await update()
+            except Exception as error:
+                name = type(error).__name__
+                failures[name] = failures.get(name, 0) + 1
+                raise
+            finally:
+                latencies.append(time.monotonic() - start)
+
+        return update_method
+
+    entries = [
+        ScaleConfigEntry(
+            f"scale{device}_{copy}",
+            {
+                CONF_HOST: "127.0.0.1",
+                CONF_PORT: args.port + device,
+                CONF_USERNAME: "admin",
+                CONF_PASSWORD: "admin",
+                CONF_SCAN_INTERVAL: args.scan_interval,
+            },
+        )
+        for device in range(devices)
+        for copy in range(args.entries_per_device)
+    ]
+    # The integration enforces a longer minimum scan interval, which also
+    # bounds how far polls are moved to align them to the device refreshes
+    custom_components.deltasol.MIN_SCAN_INTERVAL = min(
+        args.scan_interval, custom_components.deltasol.MIN_SCAN_INTERVAL
+    )
+    coordinators = []
+    for entry in entries:
+        coordinator = DeltasolCoordinator(hass, entry)
+        coordinator.update_method = timed(coordinator.async_update_data)
+        coordinators.append(coordinator)
+
+    setup_start = time.monotonic()
+    await asyncio.gather(*(coordinator.async_refresh() for coordinator in coordinators))
+    setup = time.monotonic() - setup_start
+
+    def count_update() -> None:
+        updates[0] += 1
+
+    removers = []
+    for coordinator in coordinators:
+        if coordinator.poller is not None:
+            coordinator.poller.async_add(coordinator)
+        if coordinator.aggregator is not None:
+            coordinator.async_start_sampling()
+        if coordinator.data is None:
+            # Keeps polling until the device answers
+            removers.append(coordinator.async_add_listener(count_update))
+            continue
+        for field in coordinator.data.layout.fields:
+            # One listener per sensor entity
+            removers.append(
+                coordinator.async_add_listener(count_update, field.unique_id)
+            )
+
+    lags: list[float] = []
+    executor_delays: list[float] = []
+    stop = asyncio.Event()
+    probes = [
+        asyncio.create_task(probe_loop(lags, stop)),
+        asyncio.create_task(probe_executor(hass, executor_delays, stop)),
+    ]
+    polls_before = len(latencies)
+    rss_peak = rss_mb()
+    deadline = time.monotonic() + args.duration
+    while time.monotonic() < deadline:
+        await asyncio.sleep(1)
+        rss_peak = max(rss_peak, rss_mb())
+    stop.set()
+    await asyncio.gather(*probes)
+    polls = len(latencies) - polls_before
+    rss_end = rss_mb()
+
+    for remove in removers:
+        remove()
+    for entry, coordinator in zip(entries, coordinators):
+        entry.unload()
+        await coordinator.async_shutdown()
+        if coordinator.poller is not None:
+            coordinator.poller.async_remove(coordinator)
+    await hass.async_stop(force=True)
+    simulator.terminate()
+    await simulator.wait()
+
+    return {
+        "devices": devices,
+        "entries": len(entries),
+        "fields": sum(len(c.data) for c in coordinators if c.data is not None),
+        "setup_s": round(setup, 2),
+        "without_data": sum(c.data is None for c in coordinators),
+        "polls_per_s": round(polls / args.duration, 2),
+        "poll_ms": summary(latencies),
+        "failures": failures,
+        "entity_updates": updates[0],
+        "loop_lag_ms": summary(lags),
+        "executor_delay_ms": summary(executor_delays),
+        "rss_start_mb": round(rss_start, 1),
+        "rss_peak_mb": round(rss_peak, 1),
+        "rss_end_mb": round(rss_end, 1),
+        "rss_per_entry_kb": round((rss_end - rss_start) * 1024 / len(entries), 1),
+    }
+
+
+async def main_async(args: argparse.Namespace, simulator_args: list) -> list[dict]:
+    """Run every fleet size, one after the other."""
+    # The executor Home Assistant queues its jobs to
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(args.executor_workers)
+    )
+    results = []
+    print(
+        f"{'devices':>7} {'entries':>7} {'setup':>7} {'polls/s':>8} "
+        f"{'poll p50':>9} {'p99':>8} {'fails':>6} {'lag p99':>8} {'max':>8} "
+        f"{'exec p99':>9} {'RSS':>8}"
+    )
+    for devices in (int(size) for size in args.devices.split(",")):
+        result = await run(args, devices, simulator_args)
+        results.append(result)
+        print(
+            f"{devices:>7} {result['entries']:>7} {result['setup_s']:>6.1f}s "
+            f"{result['polls_per_s']:>8.1f} {result['poll_ms']['p50'] or 0:>6.0f} ms "
+            f"{result['poll_ms']['p99'] or 0:>5.0f} ms "
+            f"{sum(result['failures'].values()):>6} "
+            f"{result['loop_lag_ms']['p99'] or 0:>5.1f} ms "
+            f"{result['loop_lag_ms']['max'] or 0:>5.1f} ms "
+            f"{result['executor_delay_ms']['p99'] or 0:>6.1f} ms "
+            f"{result['rss_end_mb']:>5.0f} MB",
+            flush=True,
+        )
+    return results
+
+
+def main() -> None:
+    """Run the scale test."""
+    argv = sys.argv[1:]
+    simulator_args = []
+    if "--" in argv:
+        argv, simulator_args = argv[: argv.index("--")], argv[argv.index("--") + 1 :]
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--devices", default="1,10,50,100")
+    parser.add_argument("--entries-per-device", type=int, default=1)
+    parser.add_argument("--duration", type=int, default=60)
+    parser.add_argument("--scan-interval", type=int, default=10)
+    parser.add_argument("--executor-workers", type=int, default=8)
+    parser.add_argument("--port", type=int, default=18000)
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    results = asyncio.run(main_async(args, simulator_args))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump({"arguments": vars(args), "results": results}, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
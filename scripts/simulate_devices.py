@@ -0,0 +1,205 @@
+"""
+Simulates a fleet of Resol KM2 and DL2/DL3 devices in the local network.
+Author: dm82m
+https://github.com/dm82m/hass-Deltasol-KM2
+
+Usage: python scripts/simulate_devices.py [--devices 10] [--port 18000]
+           [--product km2|dl2|mixed] [--latency 0.05] [--jitter 0.02]
+           [--auth-failure-rate 0.01] [--dropout-rate 0.01]
+
+Device i listens on port + i of --host and serves the device information
+(/cgi-bin/get_resol_device_information), the KM2 JSON-RPC webservice
+(/cgi-bin/resol-webservice) or the DL2/DL3 live data (/dlx/download/live).
+Responses are the synthetic payloads of synthetic_payload.py with headers
+x fields values, refreshed by the device every --refresh seconds.
+
+Every request is answered after --latency +- --jitter seconds. With
+--auth-failure-rate a request is rejected as unauthenticated, a KM2 session
+is dropped as well, and with --dropout-rate the connection is closed
+without an answer. "ready" is printed once every device listens.
+"""
+
+import argparse
+import asyncio
+import functools
+import random
+import re
+import secrets
+import time
+
+from aiohttp import web
+from synthetic_payload import payload
+
+DEVICE_INFORMATION = """vendor = "RESOL"
+product = "{product}"
+serial = "001E66{index:06X}"
+version = "2.2.0"
+build = "201811281350"
+name = "{product}"
+features = "vbus,dl2"
+"""
+
+
+class Fleet:
+    """Answers the requests of every simulated device."""
+
+    def __init__(self, args: argparse.Namespace) -> None:
+        """Initialise fleet."""
+        self.args = args
+        self.random = random.Random(args.seed)
+        self.products = [
+            (
+                ("KM2", "DL2")[index % 2] if args.product == "mixed" else args.product
+            ).upper()
+            for index in range(args.devices)
+        ]
+        # Valid KM2 authIds per device
+        self.sessions: list[set[str]] = [set() for _ in range(args.devices)]
+        self.requests = 0
+        self.failures = 0
+        self.dropouts = 0
+
+    def device(self, request: web.Request) -> int:
+        """Return the index of the device a request was sent to."""
+        return request.transport.get_extra_info("sockname")[1] - self.args.port
+
+    @functools.lru_cache(maxsize=8)  # noqa: B019
+    def body(self, product: str, timestamp: int) -> bytes:
+        """Return the live data all devices of product report at timestamp."""
+        return payload(self.args.headers, self.args.fields, timestamp, product.lower())
+
+    def timestamp(self) -> int:
+        """Return the timestamp of the data the devices report now."""
+        return int(time.time()) // self.args.refresh * self.args.refresh
+
+    def fails(self, rate: float) -> bool:
+        """Return True with the probability rate."""
+        return rate > 0 and self.random.random() < rate
+
+    @web.middleware
+    async def middleware(self, request: web.Request, handler):
+        """Delay every answer and drop some connections."""
+        self.requests += 1
+        delay = self.args.latency + self.random.uniform(
+            -self.args.jitter, self.args.jitter
+        )
+        await asyncio.sleep(max(delay, 0))
+        if self.fails(self.args.dropout_rate):
+            self.dropouts += 1
+            request.transport.close()
+            return web.Response(status=503)
+        return await handler(request)
+
+    async def device_information(self, request: web.Request) -> web.Response:
+        """Answer the product detection."""
+        index = self.device(request)
+        return web.Response(
+            text=DEVICE_INFORMATION.format(product=self.products[index], index=index)
+        )
+
+    async def webservice(self, request: web.Request) -> web.Response:
+        """Answer a KM2 JSON-RPC call."""
+        index = self.device(request)
+        # The integration sends the call with single quoted strings
+        text = await request.text()
+        method = re.search(r"'method': '(\w+)'", text).group(1)
+        params = dict(re.findall(r"'(\w+)': '([^']*)'", text.split("'params'")[1]))
+        error = b'[{"id": "1", "jsonrpc": "2.0", "error": {"message": "denied"}}]'
+
+        if method == "login":
+            if (
+                params.get("username") != self.args.username
+                or params.get("password") != self.args.password
+                or self.fails(self.args.auth_failure_rate)
+            ):
+                self.failures += 1
+                return web.Response(body=error, content_type="application/json")
+            auth_id = secrets.token_hex(8)
+            self.sessions[index].add(auth_id)
+            return web.json_response(
+                [{"id": "1", "jsonrpc": "2.0", "result": {"authId": auth_id}}]
+            )
+
+        if params.get("authId") not in self.sessions[index] or self.fails(
+            self.args.auth_failure_rate
+        ):
+            # Unknown or expired session
+            self.failures += 1
+            self.sessions[index].discard(params.get("authId"))
+            return web.Response(body=error, content_type="application/json")
+        return web.Response(
+            body=self.body("KM2", self.timestamp()), content_type="application/json"
+        )
+
+    async def live(self, request: web.Request) -> web.Response:
+        """Answer a DL2/DL3 live data download."""
+        query = request.query
+        if (
+            query.get("sessionAuthUsername", self.args.username) != self.args.username
+            or query.get("sessionAuthPassword", self.args.password)
+            != self.args.password
+            or self.fails(self.args.auth_failure_rate)
+        ):
+            self.failures += 1
+            return web.Response(status=401)
+        return web.Response(
+            body=self.body("DL2", self.timestamp()), content_type="application/json"
+        )
+
+    async def report(self) -> None:
+        """Print the request counters every 10 seconds."""
+        while True:
+            await asyncio.sleep(10)
+            print(
+                f"{self.requests} request(s), {self.failures} auth failure(s), "
+                f"{self.dropouts} dropout(s)",
+                flush=True,
+            )
+
+
+async def serve(args: argparse.Namespace) -> None:
+    """Serve the fleet until cancelled."""
+    fleet = Fleet(args)
+    app = web.Application(middlewares=[fleet.middleware])
+    app.router.add_get(
+        "/cgi-bin/get_resol_device_information", fleet.device_information
+    )
+    app.router.add_post("/cgi-bin/resol-webservice", fleet.webservice)
+    app.router.add_get("/dlx/download/live", fleet.live)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    for index in range(args.devices):
+        await web.TCPSite(runner, args.host, args.port + index).start()
+    print("ready", flush=True)
+    try:
+        await fleet.report()
+    finally:
+        await runner.cleanup()
+
+
+def main() -> None:
+    """Run the simulator."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--devices", type=int, default=10)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=18000)
+    parser.add_argument("--product", choices=["km2", "dl2", "mixed"], default="mixed")
+    parser.add_argument("--headers", type=int, default=4)
+    parser.add_argument("--fields", type=int, default=32)
+    parser.add_argument("--refresh", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--jitter", type=float, default=0.02)
+    parser.add_argument("--auth-failure-rate", type=float, default=0.0)
+    parser.add_argument("--dropout-rate", type=float, default=0.0)
+    parser.add_argument("--username", default="admin")
+    parser.add_argument("--password", default="admin")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Synthetic live responses of Resol KM2 and DL2/DL3 devices.
+Author: dm82m
+https://github.com/dm82m/hass-Deltasol-KM2
+
+Shared by benchmark_pipeline.py and simulate_devices.py.
+"""
+
+import json
+
+# Every DATE_EVERY-th field is a date, every INTEGER_EVERY-th a counter
+DATE_EVERY = 16
+INTEGER_EVERY = 4
+
+
+def payload(headers: int, fields: int, timestamp: int, product: str) -> bytes:
+    """Return a live response of headers x fields for product."""
+    live = {
+        "headers": [
+            {
+                "id": f"00_0010_{h:04X}_10_0100",
+                "description": "DeltaSol MX [Regler]",
+                "destination_name": "DFA",
+                "source_name": f"DeltaSol MX [Modul {h}]",
+                "fields": [
+                    {
+                        "id": f"{f * 4:03d}_4_0",
+                        "name": f"Date {f}"
+                        if f % DATE_EVERY == DATE_EVERY - 1
+                        else f"Sensor {f}",
+                        "unit": " Wh"
+                        if f % INTEGER_EVERY == INTEGER_EVERY - 1
+                        else " °C",
+                    }
+                    for f in range(fields)
+                ],
+            }
+            for h in range(headers)
+        ],
+        "headersets": [
+            {
+                "timestamp": timestamp,
+                "packets": [
+                    {
+                        "header_index": h,
+                        "field_values": [
+                            {
+                                "field_index": f,
+                                "raw_value": value(h, f, timestamp),
+                                "value": str(value(h, f, timestamp)),
+                            }
+                            for f in range(fields)
+                        ],
+                    }
+                    for h in range(headers)
+                ],
+            }
+        ],
+    }
+    if product == "km2":
+        live = [{"id": "1", "jsonrpc": "2.0", "result": live}]
+    return json.dumps(live).encode()
+
+
+def value(header: int, field: int, timestamp: int) -> float | int:
+    """Return the raw value of a field, a quarter of them change every poll."""
+    if field % DATE_EVERY == DATE_EVERY - 1:
+        return 800000000 + timestamp
+    if field % INTEGER_EVERY == INTEGER_EVERY - 1:
+        return header * 100000 + field * 100 + timestamp
+    return 20 + field / 8 + (timestamp % 7) / 10 * (field % 4 == 0)